@@ -1,129 +1,391 @@
 """
 AI player logic for the Tetris game.
-Implements a simple AI that decides piece placement.
+Searches the reachable placements of the current piece a few pieces ahead,
+scoring boards from incrementally maintained features, and picks a move and
+the input path that reaches it.
 """
 
+import json
+import os
 import random
-from constants import BOARD_WIDTH, BOARD_HEIGHT, AI_THINKING_DEPTH
+import time
+from constants import (
+    AI_MOVE_DELAY, AI_THINKING_DEPTH, AI_BEAM_WIDTH, AI_EVALUATION_CACHE_SIZE,
+    AI_EVALUATION_CACHE_MEMORY, AI_USE_NUMPY, AI_WEIGHTS, AI_TIME_BUDGET_FRACTION
+)
+from pieces import DISTINCT_ROTATIONS, TETROMINOES
+from cache import LRUCache, deep_sizeof
+from features import BoardFeatures
+from batch_eval import HAS_NUMPY, evaluate_boards
+from movegen import reachable_placements
+from instrumentation import metrics
+
+# Score given to a position where the next piece cannot be placed
+GAME_OVER_SCORE = -1000000
+
+# Assumed cost ratio between two depths until two iterations have been timed
+DEPTH_GROWTH = 10
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search once the decision deadline has passed"""
+
+
+def time_budget(fall_speed, move_delay=AI_MOVE_DELAY):
+    """
+    Seconds the AI may think about a piece before it should move
+    A share of the move delay plus one gravity step, so faster games get shallower searches
+    """
+    return (move_delay + fall_speed) * AI_TIME_BUDGET_FRACTION / 1000
+
+
+def load_weights(path):
+    """
+    Load a tuned weight profile saved by the tuning pipeline
+    Returns None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as profile:
+        data = json.load(profile)
+    return data.get('weights', data)
+
+
+def save_weights(path, weights, **metadata):
+    """Save a weight profile, with optional metadata, as JSON"""
+    data = dict(metadata, weights=dict(weights))
+    with open(path, 'w') as profile:
+        json.dump(data, profile, indent=2)
+
+
+# Measured bytes of cached board features, by board size
+_FEATURES_SIZES = {}
+
+
+def features_size(features):
+    """
+    Approximate the bytes held by cached board features and their board key
+    Features of one board size all have the same layout, so they are measured once,
+    with a key of full rows standing for the board
+    """
+    key = (features.width, features.height)
+    size = _FEATURES_SIZES.get(key)
+    if size is None:
+        board_key = tuple([(1 << features.width) - 1] * features.height)
+        size = _FEATURES_SIZES[key] = deep_sizeof(features) + deep_sizeof(board_key)
+    return size
 
 class TetrisAI:
-    def __init__(self, game):
+    def __init__(self, game, depth=AI_THINKING_DEPTH, beam_width=AI_BEAM_WIDTH,
+                 evaluation_cache_size=AI_EVALUATION_CACHE_SIZE,
+                 evaluation_cache_memory=AI_EVALUATION_CACHE_MEMORY,
+                 use_numpy=AI_USE_NUMPY, weights=None, seed=None):
         """Initialize the Tetris AI with a reference to the game"""
         self.game = game
+        
+        # Own random stream for the move jitter, independent of the piece generators
+        self.rng = random.Random(seed)
+        
+        # Evaluation weights, defaulting to AI_WEIGHTS for any feature not given
+        self.weights = dict(AI_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        self.depth = max(1, depth)
+        self.beam_width = beam_width
+        
+        # Batched NumPy scoring of placements, when NumPy is installed
+        self.use_numpy = use_numpy and HAS_NUMPY
+        
+        # Transposition cache shared by every decision, keyed by board contents and
+        # capped by item count and approximate memory: the features of every board
+        # reached, whatever the moves that led to it
+        self.evaluation_cache = LRUCache(
+            evaluation_cache_size, evaluation_cache_memory, features_size
+        )
+        
+        # Deadline of the running anytime search, and the depth the last decision reached
+        self.deadline = None
+        self.last_depth = 0
+        self.last_decision_time = 0.0
+    
+    def cache_stats(self):
+        """Return the size and hit/miss counters of the evaluation cache"""
+        return {
+            'evaluations': self.evaluation_cache.stats()
+        }
+    
+    def evaluate_boards(self, boards, cleared_lines=0):
+        """
+        Score many boards in one call, possibly taken from different games
+        Uses NumPy when enabled and falls back to pure Python otherwise
+        """
+        return evaluate_boards(boards, self._weighted_score, cleared_lines, self.use_numpy)
+    
+    def get_best_move(self, board, piece, next_shape=None, time_budget=None):
+        """
+        Determine the best move (position and rotation) for a piece at its spawn position
+        Returns the best x position and rotation; see plan_move for the full placement
+        """
+        plan = self.plan_move(board, piece, piece.spawn_x, 0, next_shape, time_budget)
+        if plan is None:
+            return piece.spawn_x, piece.rotation
+        best_piece, best_x, _, _ = plan
+        return best_x, best_piece.rotation
     
-    def get_best_move(self, board, piece, shape):
+    def plan_move(self, board, piece, x, y, next_shape=None, time_budget=None):
+        """
+        Choose where to lock a piece that is at (x, y), and how to get there
+        Considers every placement reachable with the game's moves, tucks and slides
+        included, then looks ahead using the known next piece and averages over all
+        tetrominoes for plies beyond the known queue
+        With a time budget in seconds, deepens the search one ply at a time up to
+        the AI depth and keeps the move of the deepest search that finished in time
+        The depth reached is stored in last_depth and the seconds taken in last_decision_time
+        Returns (piece, x, y, path) of the chosen placement, or None if there is none
         """
-        Determine the best move (position and rotation) for the current piece
-        Returns the best x position and rotation
+        cache_hits = self.evaluation_cache.hits
+        start = time.perf_counter()
+        with metrics.timer('ai.decision'):
+            candidates = self._root_candidates(board, piece, x, y)
+            if not candidates:
+                best = None
+            elif time_budget is None:
+                best = self._find_best_move(candidates, next_shape, self.depth)
+                self.last_depth = self.depth
+            else:
+                best = self._iterative_deepening(candidates, next_shape, time_budget)
+        self.last_decision_time = time.perf_counter() - start
+        metrics.count('ai.decisions')
+        metrics.gauge('ai.depth_reached', self.last_depth)
+        metrics.count('ai.cache_hits', self.evaluation_cache.hits - cache_hits)
+        metrics.gauge('ai.cache_hit_rate', round(self.evaluation_cache.stats()['hit_rate'], 3))
+        if best is None:
+            return None
+        _, best_piece, best_x, _, _, _, best_y, path = best
+        return best_piece, best_x, best_y, path
+    
+    def _root_candidates(self, board, piece, x, y):
         """
+        Generate every distinct reachable placement of the current piece
+        Returns (score, rotation, x, board, features, lines cleared, y, path) tuples, best first;
+        the boards have their completed lines cleared
+        """
+        features = self._board_features(board)
+        candidates = []
+        for rotation, test_x, test_y, path in reachable_placements(board, piece, x, y):
+            test_board = board.copy()
+            test_board.place(rotation.masks, test_x, test_y)
+            rows = test_board.clear_rows()
+            cleared = len(rows)
+            test_features = self._placed_features(
+                features, rotation, test_x, test_y, test_board, rows
+            )
+            score = self._evaluate_features(test_features, cleared)
+            candidates.append(
+                (score, rotation, test_x, test_board, test_features, cleared, test_y, path)
+            )
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        metrics.count('ai.candidates', len(candidates))
+        return candidates
+    
+    def _iterative_deepening(self, candidates, next_shape, time_budget):
+        """
+        Search depth 1, 2, ... until the AI depth or the deadline is reached
+        Depth 1 always completes, so there is always a move; a deeper search is only
+        started when its estimated cost fits in the remaining time
+        """
+        start = time.perf_counter()
+        deadline = start + time_budget
+        best = self._find_best_move(candidates, next_shape, 1)
+        self.last_depth = 1
+        
+        previous_cost = None
+        cost = time.perf_counter() - start
+        for depth in range(2, self.depth + 1):
+            growth = cost / previous_cost if previous_cost else DEPTH_GROWTH
+            iteration_start = time.perf_counter()
+            if iteration_start + cost * growth > deadline:
+                break
+            
+            self.deadline = deadline
+            try:
+                best = self._find_best_move(candidates, next_shape, depth)
+            except SearchTimeout:
+                break
+            finally:
+                self.deadline = None
+            self.last_depth = depth
+            previous_cost = cost
+            cost = time.perf_counter() - iteration_start
+        return best
+    
+    def _find_best_move(self, candidates, next_shape, depth):
+        """Search depth plies below the root candidates and return the best candidate"""
         best_score = float('-inf')
-        best_x = 0
-        best_rotation = 0
+        best = None
+        queue = (next_shape,) if next_shape else ()
         
-        # Try all possible rotations
-        rotations = 4  # Maximum 4 rotations (0°, 90°, 180°, 270°)
-        current_piece = piece
+        # Only the most promising placements are searched deeper
+        if depth > 1:
+            candidates = candidates[:self.beam_width]
         
-        for rotation in range(rotations):
-            # Get width of the current piece orientation
-            piece_width = len(current_piece[0])
+        for candidate in candidates:
+            static_score, _, _, test_board, test_features, cleared = candidate[:6]
+            if depth > 1:
+                score = self._search(
+                    test_board, test_features, cleared, queue,
+                    depth - 1, max(1, self.beam_width // 2)
+                )
+            else:
+                score = static_score
             
-            # Try all possible x positions
-            for x in range(BOARD_WIDTH - piece_width + 1):
-                # Create a copy of the board for simulation
-                test_board = [row[:] for row in board]
-                
-                # Find the y position where the piece would land
-                y = 0
-                while y < BOARD_HEIGHT and not self._check_collision(test_board, current_piece, x, y + 1):
-                    y += 1
-                
-                # Place the piece on the test board
-                self._place_piece(test_board, current_piece, x, y)
-                
-                # Evaluate the board
-                score = self._evaluate_board(test_board)
-                
-                # Add some randomness to make the AI less predictable
-                score += random.uniform(-0.5, 0.5)
-                
-                # Update best move if this one is better
-                if score > best_score:
-                    best_score = score
-                    best_x = x
-                    best_rotation = rotation
+            # Add some randomness to make the AI less predictable
+            score += self.rng.uniform(-0.5, 0.5)
             
-            # Rotate the piece for the next iteration
-            current_piece = self._rotate_piece(current_piece)
+            # Update best move if this one is better
+            if score > best_score:
+                best_score = score
+                best = candidate
         
-        return best_x, best_rotation
+        return best
     
-    def _check_collision(self, board, piece, x, y):
-        """Check if a piece collides with the board boundaries or other pieces"""
-        for row in range(len(piece)):
-            for col in range(len(piece[row])):
-                if piece[row][col]:
-                    # Check if piece is out of bounds
-                    if (y + row >= BOARD_HEIGHT or 
-                        x + col < 0 or 
-                        x + col >= BOARD_WIDTH):
-                        return True
-                    
-                    # Check if piece collides with another piece on the board
-                    if y + row >= 0 and board[y + row][x + col]:
-                        return True
-        
-        return False
-    
-    def _place_piece(self, board, piece, x, y):
-        """Place a piece on the board (for simulation purposes)"""
-        for row in range(len(piece)):
-            for col in range(len(piece[row])):
-                if piece[row][col] and 0 <= y + row < BOARD_HEIGHT and 0 <= x + col < BOARD_WIDTH:
-                    board[y + row][x + col] = 1
+    def _expand(self, board, features, shape, cleared):
+        """
+        Generate every placement of a shape on the board
+        Returns (score, rotation, x, board, features, lines cleared) tuples, best first;
+        lines cleared counts the lines of the whole line of play so far
+        """
+        lines_score = self._weighted_score(cleared, 0, 0, 0)
+        placements = [
+            (score + lines_score, rotation, x, test_board, test_features, cleared + lines)
+            for rotation, x, test_board, test_features, lines, score
+            in self._placements(board, features, shape)
+        ]
+        placements.sort(key=lambda placement: placement[0], reverse=True)
+        metrics.count('ai.candidates', len(placements))
+        return placements
     
-    def _rotate_piece(self, piece):
-        """Rotate a piece 90 degrees clockwise"""
-        rows = len(piece)
-        cols = len(piece[0])
-        
-        # Create a new rotated piece
-        rotated = [[0 for _ in range(rows)] for _ in range(cols)]
+    def _placements(self, board, features, shape):
+        """
+        Get the (rotation, x, board, features, lines cleared, score) placements of a shape
+        Boards have their completed lines cleared, and are scored counting those lines;
+        features come from the evaluation cache or are updated as deltas from the
+        parent instead of rescanning each board;
+        with NumPy enabled all placements are scored in one batch instead and
+        features are left to be computed for the placements searched deeper
+        """
+        children = []
         
-        # Fill the rotated piece
-        for row in range(rows):
-            for col in range(cols):
-                rotated[col][rows - 1 - row] = piece[row][col]
+        # Try each distinct orientation once (O has 1, I/S/Z have 2)
+        for rotation in DISTINCT_ROTATIONS[shape]:
+            masks = rotation.masks
+            
+            # Try all possible x positions
+            for x in rotation.x_positions():
+                # Find the y position where the piece would land, skipping
+                # columns the piece cannot even enter
+                y = board.landing(rotation, x)
+                if y < 0:
+                    continue
+                
+                # Place the piece on a copy of the board and clear its lines
+                test_board = board.copy()
+                test_board.place(masks, x, y)
+                rows = test_board.clear_rows()
+                if self.use_numpy:
+                    test_features = None
+                else:
+                    test_features = self._placed_features(
+                        features, rotation, x, y, test_board, rows
+                    )
+                children.append((rotation, x, test_board, test_features, len(rows)))
         
-        return rotated
+        if self.use_numpy:
+            scores = self.evaluate_boards(
+                [child[2] for child in children], [child[4] for child in children]
+            )
+        else:
+            scores = [self._evaluate_features(child[3], child[4]) for child in children]
+        return [child + (score,) for child, score in zip(children, scores)]
     
-    def _evaluate_board(self, board):
+    def _search(self, board, features, cleared, queue, depth, beam_width):
         """
-        Evaluate a board position using a weighted sum of features
-        Higher score means better position
+        Score a board, already cleared of its completed lines, for the remaining plies
+        Uses the known queue first, then takes the expectation over all tetrominoes
         """
-        # Count completed lines
-        completed_lines = self._count_completed_lines(board)
+        if features is None:
+            features = self._board_features(board)
         
-        # Calculate height of each column
-        heights = self._get_column_heights(board)
+        if queue:
+            return self._best_score(
+                board, features, cleared, queue[0], queue[1:], depth, beam_width
+            )
         
-        # Calculate bumpiness (sum of height differences between adjacent columns)
-        bumpiness = self._get_bumpiness(heights)
-        
-        # Count holes (empty cells with at least one filled cell above)
-        holes = self._count_holes(board, heights)
+        total = 0
+        for shape in TETROMINOES:
+            total += self._best_score(board, features, cleared, shape, (), depth, beam_width)
+        return total / len(TETROMINOES)
+    
+    def _best_score(self, board, features, cleared, shape, queue, depth, beam_width):
+        """Score of the best placement of a shape, searching depth plies"""
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
         
-        # Calculate aggregate height (sum of all column heights)
-        aggregate_height = sum(heights)
+        placements = self._expand(board, features, shape, cleared)
+        if not placements:
+            return GAME_OVER_SCORE
+        if depth == 1:
+            return placements[0][0]
         
-        # Weights for each feature
-        weights = {
-            'completed_lines': 8.0,
-            'holes': -6,
-            'bumpiness': -2.5,
-            'aggregate_height': -0.8
-        }
+        # The beam narrows at every ply to keep deep searches affordable
+        return max(
+            self._search(
+                test_board, test_features, lines, queue, depth - 1, max(1, beam_width // 2)
+            )
+            for _, _, _, test_board, test_features, lines in placements[:beam_width]
+        )
+    
+    def _board_features(self, board):
+        """Get the features of a board from the evaluation cache, scanning it on a miss"""
+        key = board.key()
+        features = self.evaluation_cache.get(key)
+        if features is None:
+            features = BoardFeatures.from_board(board)
+            self.evaluation_cache.put(key, features)
+        return features
+    
+    def _placed_features(self, features, rotation, x, y, board, rows):
+        """
+        Get the features of a board just placed on and cleared of the given rows
+        Boards reached before, by any move sequence, are served from the evaluation
+        cache; others are updated as deltas from the parent features
+        The cached features are shared and must not be modified
+        """
+        key = board.key()
+        placed = self.evaluation_cache.get(key)
+        if placed is None:
+            placed = features.copy()
+            placed.place(rotation, x, y)
+            placed.clear_lines(board, rows)
+            self.evaluation_cache.put(key, placed)
+        return placed
+    
+    def _evaluate_features(self, features, cleared_lines=0):
+        """
+        Evaluate a board from its incrementally maintained features
+        Lines already cleared earlier in the search count as completed lines;
+        higher score means better position
+        """
+        return self._weighted_score(
+            features.completed_lines + cleared_lines,
+            features.total_holes,
+            features.bumpiness,
+            features.aggregate_height
+        )
+    
+    def _weighted_score(self, completed_lines, holes, bumpiness, aggregate_height):
+        """Combine board features into a single score"""
+        weights = self.weights
         
         # Calculate weighted sum
         score = (
@@ -134,43 +396,3 @@ class TetrisAI:
         )
         
         return score
-    
-    def _count_completed_lines(self, board):
-        """Count the number of completed lines on the board"""
-        completed = 0
-        for row in range(BOARD_HEIGHT):
-            if all(board[row]):
-                completed += 1
-        return completed
-    
-    def _get_column_heights(self, board):
-        """Get the height of each column (highest occupied cell)"""
-        heights = [0] * BOARD_WIDTH
-        for col in range(BOARD_WIDTH):
-            for row in range(BOARD_HEIGHT):
-                if board[row][col]:
-                    heights[col] = BOARD_HEIGHT - row
-                    break
-        return heights
-    
-    def _get_bumpiness(self, heights):
-        """Calculate the sum of height differences between adjacent columns"""
-        bumpiness = 0
-        for i in range(len(heights) - 1):
-            bumpiness += abs(heights[i] - heights[i + 1])
-        return bumpiness
-    
-    def _count_holes(self, board, heights):
-        """Count holes (empty cells with at least one filled cell above)"""
-        holes = 0
-        for col in range(BOARD_WIDTH):
-            # Skip if column is empty
-            if heights[col] == 0:
-                continue
-            
-            # Count empty cells below the highest filled cell
-            for row in range(BOARD_HEIGHT - heights[col], BOARD_HEIGHT):
-                if not board[row][col]:
-                    holes += 1
-        
-        return holes
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Background worker running AI decisions off the Tk main thread.
+Requests carry a snapshot of the board and piece plus a token; the frontend
+polls for results and discards any whose token no longer matches its piece.
+"""
+
+import queue
+import threading
+
+# Longest time a blocking poll waits for a decision (seconds)
+POLL_TIMEOUT = 1.0
+
+
+class AIWorker:
+    def __init__(self, ai):
+        """Start a daemon thread answering decision requests with the given TetrisAI"""
+        self.ai = ai
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="ai-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, token, board, piece, x, y, next_shape=None, time_budget=None):
+        """
+        Ask where a piece at (x, y) should lock, within an optional time budget
+        The board is copied, so the game can keep changing its own board meanwhile
+        """
+        self.requests.put((token, board.copy(), piece, x, y, next_shape, time_budget))
+
+    def poll(self, block=False):
+        """
+        Return the next finished (token, plan, seconds, depth) result, or None
+        plan is the (piece, x, y, path) returned by TetrisAI.plan_move, seconds
+        the time the decision took and depth the search depth it reached
+        With block set, waits up to POLL_TIMEOUT for a result
+        """
+        try:
+            return self.results.get(block, POLL_TIMEOUT)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop the worker thread after its current decision"""
+        self.requests.put(None)
+
+    def _run(self):
+        """Answer requests until closed, skipping requests superseded by newer ones"""
+        while True:
+            request = self.requests.get()
+            while request is not None and not self.requests.empty():
+                request = self.requests.get()
+            if request is None:
+                return
+            token, board, piece, x, y, next_shape, time_budget = request
+            plan = self.ai.plan_move(board, piece, x, y, next_shape, time_budget)
+            self.results.put((token, plan, self.ai.last_decision_time, self.ai.last_depth))
@@ -0,0 +1,102 @@
+"""
+Batched board evaluation for the AI.
+Scores many boards in a few NumPy array operations; NumPy is optional and
+the same functions fall back to pure Python when it is not installed.
+"""
+
+from features import BoardFeatures
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def stack_boards(boards):
+    """Stack the row masks of any number of boards into an (N, height) array"""
+    return np.array([board.rows for board in boards], dtype=np.int64)
+
+
+def unpack_rows(rows, width):
+    """Expand an (N, height) array of row masks into an (N, height, width) cell array"""
+    return ((rows[..., None] >> np.arange(width)) & 1).astype(bool)
+
+
+def batch_features(cells):
+    """
+    Compute the evaluation features of an (N, height, width) cell array
+    Returns arrays of completed lines, holes, bumpiness and aggregate height
+    """
+    completed_lines = cells.all(axis=2).sum(axis=1)
+
+    # A cell is covered once any cell at or above it in its column is filled
+    covered = np.logical_or.accumulate(cells, axis=1)
+    holes = (covered & ~cells).sum(axis=(1, 2))
+
+    heights = covered.sum(axis=1)
+    bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    aggregate_height = heights.sum(axis=1)
+    return completed_lines, holes, bumpiness, aggregate_height
+
+
+def _popcount_table(width, tables={}):
+    """Return a lookup array of the number of set bits of every row mask of a width"""
+    table = tables.get(width)
+    if table is None:
+        table = tables[width] = np.array(
+            [bin(value).count("1") for value in range(1 << width)], dtype=np.int64
+        )
+    return table
+
+
+def mask_features(rows, width):
+    """
+    Compute the evaluation features of an (N, height) array of row masks
+    Same results as batch_features, without expanding the boards into cells:
+    a column's filled-or-covered cells form a run down to the floor, so bumpiness
+    counts the cells covered in only one of two neighbouring columns
+    """
+    popcount = _popcount_table(width)
+    completed_lines = (rows == (1 << width) - 1).sum(axis=1)
+
+    covered = np.bitwise_or.accumulate(rows, axis=1)
+    holes = popcount[covered & ~rows].sum(axis=1)
+    aggregate_height = popcount[covered].sum(axis=1)
+    edges = (covered ^ (covered >> 1)) & ((1 << (width - 1)) - 1)
+    bumpiness = popcount[edges].sum(axis=1)
+    return completed_lines, holes, bumpiness, aggregate_height
+
+
+def evaluate_boards(boards, score_function, cleared_lines=0, use_numpy=True):
+    """
+    Score a list of boards, which may come from many different games
+    score_function combines (completed lines, holes, bumpiness, aggregate height)
+    and must work element-wise on arrays; cleared_lines is a number or one per board
+    Returns a list of scores in the order of the boards
+    """
+    if not boards:
+        return []
+
+    if use_numpy and HAS_NUMPY:
+        cells = unpack_rows(stack_boards(boards), boards[0].width)
+        completed_lines, holes, bumpiness, aggregate_height = batch_features(cells)
+        scores = score_function(
+            completed_lines + np.asarray(cleared_lines), holes, bumpiness, aggregate_height
+        )
+        return scores.tolist()
+
+    if isinstance(cleared_lines, int):
+        cleared_lines = [cleared_lines] * len(boards)
+
+    scores = []
+    for board, cleared in zip(boards, cleared_lines):
+        features = BoardFeatures.from_board(board)
+        scores.append(score_function(
+            features.completed_lines + cleared,
+            features.total_holes,
+            features.bumpiness,
+            features.aggregate_height
+        ))
+    return scores
@@ -0,0 +1,394 @@
+"""
+Vectorized simulator playing many solo AI games in lockstep.
+Every board is a row of an (N, height) array of row masks; each step places one
+piece on all of them with array operations: spawn, greedy placement with the
+TetrisAI evaluation, line clears by row compaction and ScoreManager scoring.
+Finished games are replaced by the next ones until every game has been played.
+NumPy is optional; without it the same games are played one by one in Python.
+
+Usage: python -m batch_sim --games 1000 --batch 1024 --max-pieces 500 [--compare 20]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from batch_eval import HAS_NUMPY, mask_features
+from board import Board
+from constants import (
+    AI_WEIGHTS, BOARD_WIDTH, BOARD_HEIGHT, PIECE_POLICY, SPECIAL_PIECE_THRESHOLD,
+    BATCH_SIM_SIZE
+)
+from features import BoardFeatures
+from pieces import DISTINCT_ROTATIONS, ROTATIONS, get_rotation
+from randomizer import PieceGenerator
+from replay import SHAPE_NAMES
+from score import ScoreManager
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Evaluation features, in the order TetrisAI combines them
+FEATURES = ('completed_lines', 'holes', 'bumpiness', 'aggregate_height')
+
+# Most rows any orientation of any shape spans
+MAX_PIECE_ROWS = max(len(piece.masks) for pieces in ROTATIONS.values() for piece in pieces)
+
+
+def points_table():
+    """Return the points scored for clearing 0 to 4 lines at once, as ScoreManager awards them"""
+    return [ScoreManager().update_ai_score(lines) for lines in range(5)]
+
+
+def _weights(weights):
+    """Complete a weight profile with AI_WEIGHTS, like TetrisAI does"""
+    return dict(AI_WEIGHTS, **(weights or {}))
+
+
+def _result(game, seed, score, lines, pieces, topped_out):
+    """Build a game result with the fields of a solo self-play result"""
+    return {
+        'game': game,
+        'seed': seed,
+        'ai_score': score,
+        'ai_lines': lines,
+        'ai_pieces': pieces,
+        'topped_out': topped_out
+    }
+
+
+def play_game(game, seed, weights=None, max_pieces=1000, policy=PIECE_POLICY, jitter=True):
+    """
+    Play one game in pure Python, the reference for the vectorized simulator
+    Each piece is hard-dropped at the placement the TetrisAI evaluation rates best,
+    counting the lines it clears, with TetrisAI's random jitter when jitter is set
+    """
+    weights = _weights(weights)
+    generator = PieceGenerator(seed, policy)
+    rng = random.Random(seed)
+    table = points_table()
+    board = Board()
+    score = lines = pieces = 0
+    override = None
+    while True:
+        shape = override or generator.next()
+        override = None
+        spawn = get_rotation(shape)
+        if board.collides(spawn.masks, spawn.spawn_x, 0):
+            return _result(game, seed, score, lines, pieces, True)
+        if pieces >= max_pieces:
+            return _result(game, seed, score, lines, pieces, False)
+
+        best_score = float('-inf')
+        best = None
+        best_cleared = 0
+        for rotation in DISTINCT_ROTATIONS[shape]:
+            for x in rotation.x_positions():
+                if board.collides(rotation.masks, x, 0):
+                    continue
+                y = board.drop_y(rotation, x)
+                test_board = board.copy()
+                test_board.place(rotation.masks, x, y)
+                cleared = test_board.clear_lines()
+                features = BoardFeatures.from_board(test_board)
+                value = (
+                    weights['completed_lines'] * (features.completed_lines + cleared) +
+                    weights['holes'] * features.total_holes +
+                    weights['bumpiness'] * features.bumpiness +
+                    weights['aggregate_height'] * features.aggregate_height
+                )
+                if jitter:
+                    value += rng.uniform(-0.5, 0.5)
+                if value > best_score:
+                    best_score = value
+                    best = test_board
+                    best_cleared = cleared
+
+        board = best
+        cleared = best_cleared
+        points = table[cleared]
+        if (score + points) // SPECIAL_PIECE_THRESHOLD > score // SPECIAL_PIECE_THRESHOLD:
+            override = 'SPECIAL'
+        score += points
+        lines += cleared
+        pieces += 1
+
+
+def _clear_full_rows(boards, rows):
+    """
+    Clear the full rows of an (N, height) array of row masks in place, moving the
+    other rows to the bottom in their order
+    Returns the boards and the number of rows each had cleared
+    """
+    full = boards == (1 << BOARD_WIDTH) - 1
+    cleared = full.sum(axis=1)
+    clearing = np.flatnonzero(cleared)
+    if len(clearing):
+        order = np.argsort(np.where(full[clearing], -1, rows), axis=1, kind='stable')
+        compacted = np.take_along_axis(boards[clearing], order, axis=1)
+        compacted[rows < cleared[clearing, None]] = 0
+        boards[clearing] = compacted
+    return boards, cleared
+
+
+class _CandidateTable:
+    def __init__(self, shape):
+        """
+        Precompute every (orientation, x) drop placement of a shape as arrays
+        Piece rows are padded to MAX_PIECE_ROWS with empty masks, which never collide
+        """
+        dys = []
+        masks = []
+        for rotation in DISTINCT_ROTATIONS[shape]:
+            for x in rotation.x_positions():
+                rows = [(dy, mask << x if x >= 0 else mask >> -x) for dy, mask in rotation.masks]
+                rows += [(0, 0)] * (MAX_PIECE_ROWS - len(rows))
+                dys.append([dy for dy, _ in rows])
+                masks.append([mask for _, mask in rows])
+        self.dy = np.array(dys, dtype=np.int64)
+        self.masks = np.array(masks, dtype=np.int64)
+
+        spawn = get_rotation(shape)
+        self.spawn_dy = np.array([dy for dy, _ in spawn.masks], dtype=np.int64)
+        self.spawn_masks = np.array(
+            [mask << spawn.spawn_x for _, mask in spawn.masks], dtype=np.int64
+        )
+
+
+class BatchSimulator:
+    def __init__(self, batch_size=BATCH_SIM_SIZE, max_pieces=1000, policy=PIECE_POLICY,
+                 jitter=True, seed=0, use_numpy=True):
+        """
+        Initialize a simulator playing up to batch_size games at once
+        Without NumPy, or with use_numpy unset, games are played one by one instead
+        """
+        self.batch_size = batch_size
+        self.max_pieces = max_pieces
+        self.policy = policy
+        self.jitter = jitter
+        self.seed = seed
+        self.use_numpy = use_numpy and HAS_NUMPY
+        self.points = points_table()
+        self.tables = {}
+
+    def run(self, jobs):
+        """
+        Play a game for every (seed, weights) job; weights may be None for AI_WEIGHTS
+        Returns the results in the order of the jobs
+        """
+        jobs = list(jobs)
+        if not self.use_numpy:
+            return [
+                play_game(game, seed, weights, self.max_pieces, self.policy, self.jitter)
+                for game, (seed, weights) in enumerate(jobs)
+            ]
+        return self._run_batched(jobs)
+
+    def _table(self, shape):
+        """Return the candidate table of a shape, building it on first use"""
+        table = self.tables.get(shape)
+        if table is None:
+            table = self.tables[shape] = _CandidateTable(shape)
+        return table
+
+    def _run_batched(self, jobs):
+        """Play the jobs in lockstep, refilling the slots of finished games"""
+        slots = min(self.batch_size, len(jobs))
+        height = BOARD_HEIGHT
+        rng = np.random.default_rng(self.seed)
+        points = np.array(self.points, dtype=np.int64)
+
+        boards = np.zeros((slots, height), dtype=np.int64)
+        weights = np.zeros((slots, len(FEATURES)))
+        scores = np.zeros(slots, dtype=np.int64)
+        lines = np.zeros(slots, dtype=np.int64)
+        pieces = np.zeros(slots, dtype=np.int64)
+        shapes = np.zeros(slots, dtype=np.int64)
+        active = np.zeros(slots, dtype=bool)
+        games = [None] * slots
+        generators = [None] * slots
+        results = [None] * len(jobs)
+        special = SHAPE_NAMES.index('SPECIAL')
+
+        def load(slot, game):
+            """Start the next game in a slot, or leave the slot empty"""
+            if game >= len(jobs):
+                active[slot] = False
+                return
+            seed, game_weights = jobs[game]
+            game_weights = _weights(game_weights)
+            boards[slot] = 0
+            weights[slot] = [game_weights[name] for name in FEATURES]
+            scores[slot] = lines[slot] = pieces[slot] = 0
+            games[slot] = game
+            generators[slot] = PieceGenerator(seed, self.policy)
+            shapes[slot] = SHAPE_NAMES.index(generators[slot].next())
+            active[slot] = True
+
+        def finish(slot, topped_out):
+            """Record the result of a slot's game and start the next one"""
+            nonlocal next_game
+            game = games[slot]
+            results[game] = _result(
+                game, jobs[game][0], int(scores[slot]), int(lines[slot]), int(pieces[slot]),
+                topped_out
+            )
+            load(slot, next_game)
+            next_game += 1
+
+        for slot in range(slots):
+            load(slot, slot)
+        next_game = slots
+
+        rows = np.arange(height)
+        while active.any():
+            # Spawn: games whose new piece collides, or that reached the limit, are over
+            placed_slots = []
+            placed_cleared = []
+            for shape_index in np.unique(shapes[active]):
+                group = np.flatnonzero(active & (shapes == shape_index))
+                table = self._table(SHAPE_NAMES[shape_index])
+                topped = ((boards[group][:, table.spawn_dy] & table.spawn_masks) != 0).any(axis=1)
+                done = topped | (pieces[group] >= self.max_pieces)
+                for slot, topped_out in zip(group[done], topped[done]):
+                    finish(slot, bool(topped_out))
+                group = group[~done]
+                if len(group):
+                    boards[group], group_cleared = self._place(
+                        boards[group], weights[group], table, rng, rows
+                    )
+                    placed_slots.append(group)
+                    placed_cleared.append(group_cleared)
+            if not placed_slots:
+                continue
+
+            placed = np.concatenate(placed_slots)
+            cleared = np.concatenate(placed_cleared)
+
+            old_scores = scores[placed]
+            scores[placed] = old_scores + points[cleared]
+            lines[placed] += cleared
+            pieces[placed] += 1
+
+            # Special Piece: every SPECIAL_PIECE_THRESHOLD points the next piece is special
+            bonus = scores[placed] // SPECIAL_PIECE_THRESHOLD > old_scores // SPECIAL_PIECE_THRESHOLD
+            for slot, gets_special in zip(placed.tolist(), bonus.tolist()):
+                if gets_special:
+                    shapes[slot] = special
+                else:
+                    shapes[slot] = SHAPE_NAMES.index(generators[slot].next())
+        return results
+
+    def _place(self, boards, weights, table, rng, rows):
+        """
+        Hard-drop a piece on every board at the placement rated best by the evaluation
+        Returns the boards with the piece placed and their full rows cleared, and the
+        number of rows each cleared
+        """
+        count = len(boards)
+        height = boards.shape[1]
+        dy = table.dy
+        masks = table.masks
+
+        # For each piece row, the first board row at or below it that blocks it;
+        # the piece lands one row above the first position where any piece row is blocked
+        hits = (boards[:, None, None, :] & masks[None, :, :, None]) != 0
+        hits &= rows >= dy[:, :, None]
+        first = np.where(hits.any(axis=3), hits.argmax(axis=3), height)
+        landing = (first - dy).min(axis=2) - 1
+        valid = landing >= 0
+        landing = np.maximum(landing, 0)
+
+        # Place every candidate on its own copy of the board
+        placed = np.repeat(boards[:, None, :], len(dy), axis=1)
+        for row in range(dy.shape[1]):
+            index = np.minimum(landing + dy[:, row], height - 1)[..., None]
+            filled = np.take_along_axis(placed, index, axis=2) | masks[None, :, row, None]
+            np.put_along_axis(placed, index, filled, axis=2)
+
+        # Rate every candidate with the TetrisAI evaluation, using each game's weights:
+        # like TetrisAI, clear the full rows first and count them as completed lines
+        candidates, cleared = _clear_full_rows(placed.reshape(-1, height), rows)
+        completed_lines, holes, bumpiness, aggregate_height = (
+            feature.reshape(count, -1) for feature in mask_features(candidates, BOARD_WIDTH)
+        )
+        cleared = cleared.reshape(count, -1)
+        values = (
+            weights[:, 0, None] * (completed_lines + cleared) +
+            weights[:, 1, None] * holes +
+            weights[:, 2, None] * bumpiness +
+            weights[:, 3, None] * aggregate_height
+        )
+        if self.jitter:
+            values = values + rng.uniform(-0.5, 0.5, values.shape)
+        values = np.where(valid, values, -np.inf)
+        best = values.argmax(axis=1)
+        chosen = np.arange(count)
+        return candidates.reshape(count, -1, height)[chosen, best], cleared[chosen, best]
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the batch simulator"""
+    parser = argparse.ArgumentParser(description="Play many solo AI games in lockstep with NumPy")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--batch", type=int, default=BATCH_SIM_SIZE, help="games played at once")
+    parser.add_argument("--max-pieces", type=int, default=500,
+                        help="stop a game once this many pieces were placed")
+    parser.add_argument("--policy", default=PIECE_POLICY, help="how pieces are dealt")
+    parser.add_argument("--no-jitter", action="store_true",
+                        help="always take the best rated placement, without random jitter")
+    parser.add_argument("--compare", type=int, default=0, metavar="GAMES",
+                        help="also play this many games one by one in Python and report the speedup")
+    parser.add_argument("--output", default=None, help="JSONL file for the per-game results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the simulator and print a summary of the games"""
+    args = parse_args(argv)
+    jobs = [(args.seed + game, None) for game in range(args.games)]
+    simulator = BatchSimulator(args.batch, args.max_pieces, args.policy, not args.no_jitter, args.seed)
+
+    start = time.perf_counter()
+    results = simulator.run(jobs)
+    duration = time.perf_counter() - start
+    pieces = sum(result['ai_pieces'] for result in results)
+    summary = {
+        'games': len(results),
+        'numpy': simulator.use_numpy,
+        'mean_score': round(statistics.mean(result['ai_score'] for result in results), 1),
+        'mean_lines': round(statistics.mean(result['ai_lines'] for result in results), 1),
+        'topped_out': sum(result['topped_out'] for result in results),
+        'seconds': round(duration, 3),
+        'pieces_per_second': round(pieces / duration)
+    }
+
+    if args.compare:
+        reference = BatchSimulator(
+            max_pieces=args.max_pieces, policy=args.policy, jitter=not args.no_jitter,
+            use_numpy=False
+        )
+        start = time.perf_counter()
+        python_results = reference.run(jobs[:args.compare])
+        python_duration = time.perf_counter() - start
+        python_pieces = sum(result['ai_pieces'] for result in python_results)
+        summary['python_pieces_per_second'] = round(python_pieces / python_duration)
+        summary['speedup'] = round(summary['pieces_per_second'] / summary['python_pieces_per_second'], 1)
+        if args.no_jitter:
+            summary['matches_python'] = python_results == results[:args.compare]
+
+    if args.output:
+        with open(args.output, "w") as output:
+            for result in results:
+                output.write(json.dumps(result) + "\n")
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Benchmark suite for the engine, AI and rendering hot paths.
+Runs every benchmark on fixed seeded boards at several fill levels, writes the
+results to JSON and compares them against a stored baseline.
+
+Usage: python -m benchmark --output results.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from constants import BOARD_WIDTH, BOARD_HEIGHT, PIECE_COLORS
+from ai import TetrisAI
+from board import Board
+from pieces import DISTINCT_ROTATIONS, TETROMINOES
+from renderer import BoardRenderer
+from selfplay import play_solo
+
+# Fraction of the board height covered by garbage in the seeded boards
+FILL_LEVELS = (0.0, 0.25, 0.5, 0.75)
+
+# Seeded boards generated for each fill level
+BOARDS_PER_LEVEL = 8
+
+# Search depths timed by the AI benchmark
+AI_DEPTHS = (1, 2, 3)
+
+# Search depths of the full-game benchmark; deeper games take minutes
+GAME_DEPTHS = (1, 2)
+
+# Timed rounds of each benchmark; the fastest is kept to filter out noise
+REPEAT = 3
+
+# Slowdown, as a fraction of the baseline rate, reported as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def seeded_boards(fill, count=BOARDS_PER_LEVEL, seed=0):
+    """
+    Generate boards whose bottom rows are filled with random garbage
+    Every garbage row has at least one hole, so no row starts out complete
+    """
+    rng = random.Random(f"{seed}-{fill}")
+    boards = []
+    for _ in range(count):
+        board = Board()
+        filled_rows = int(BOARD_HEIGHT * fill)
+        for row in range(BOARD_HEIGHT - filled_rows, BOARD_HEIGHT):
+            mask = rng.getrandbits(BOARD_WIDTH) & board.full_mask
+            board.rows[row] = mask & ~(1 << rng.randrange(BOARD_WIDTH))
+        boards.append(board)
+    return boards
+
+
+class StubCanvas:
+    """Canvas stand-in that records item options without a display"""
+
+    def __init__(self):
+        """Initialize an empty item table"""
+        self.items = {}
+        self.calls = 0
+
+    def create_rectangle(self, *coords, **options):
+        """Create an item and return its id"""
+        item = len(self.items) + 1
+        self.items[item] = [coords, options]
+        return item
+
+    def itemconfig(self, item, **options):
+        """Update the options of an item"""
+        self.calls += 1
+        self.items[item][1].update(options)
+
+    def coords(self, item, *coords):
+        """Move an item"""
+        self.calls += 1
+        self.items[item][0] = coords
+
+
+def measure(function, min_time, repeat=REPEAT):
+    """
+    Call function repeatedly for at least min_time seconds, in each of repeat rounds
+    function returns how many operations it performed; returns the best operations per second
+    """
+    best = 0.0
+    for _ in range(repeat):
+        operations = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time or not operations:
+            operations += function()
+            elapsed = time.perf_counter() - start
+        best = max(best, operations / elapsed)
+    return best
+
+
+def bench_collision(boards):
+    """Collision checks of every orientation, column and row on each board"""
+    def run():
+        checks = 0
+        for board in boards:
+            for shape in TETROMINOES:
+                for rotation in DISTINCT_ROTATIONS[shape]:
+                    masks = rotation.masks
+                    for x in rotation.x_positions():
+                        for y in range(BOARD_HEIGHT):
+                            board.collides(masks, x, y)
+                        checks += BOARD_HEIGHT
+        return checks
+    return run
+
+
+def bench_place(boards):
+    """Placing every orientation at every column at its landing row, on a board copy"""
+    drops = [
+        (board, rotation.masks, x, board.drop_y(rotation, x))
+        for board in boards
+        for shape in TETROMINOES
+        for rotation in DISTINCT_ROTATIONS[shape]
+        for x in rotation.x_positions()
+        if not board.collides(rotation.masks, x, 0)
+    ]
+
+    def run():
+        for board, masks, x, y in drops:
+            board.copy().place(masks, x, y)
+        return len(drops)
+    return run
+
+
+def bench_clear(boards):
+    """Clearing boards with two completed rows among the garbage, on a board copy"""
+    full_boards = []
+    for board in boards:
+        board = board.copy()
+        board.rows[-1] = board.full_mask
+        board.rows[BOARD_HEIGHT // 2] = board.full_mask
+        full_boards.append(board)
+
+    def run():
+        for board in full_boards:
+            board.copy().clear_lines()
+        return len(full_boards)
+    return run
+
+
+def bench_ai(boards, depth, seed=0):
+    """AI decisions on each board, with a cold evaluation cache for every decision"""
+    rng = random.Random(seed)
+    positions = [
+        (board, rng.choice(TETROMINOES), rng.choice(TETROMINOES)) for board in boards
+    ]
+
+    def run():
+        for board, shape, next_shape in positions:
+            ai = TetrisAI(None, depth=depth, seed=seed)
+            ai.get_best_move(board, DISTINCT_ROTATIONS[shape][0], next_shape)
+        return len(positions)
+    return run
+
+
+def bench_redraw(boards):
+    """
+    Board redraws as done by the Tk frontend, on a stub canvas
+    Alternates between boards so every frame changes many cells and moves the piece
+    """
+    renderer = BoardRenderer(StubCanvas(), 0, 0, "board")
+    piece = DISTINCT_ROTATIONS['T'][0]
+    color = PIECE_COLORS['T']
+
+    def run():
+        for frame, board in enumerate(boards):
+            renderer.render(board, piece, piece.spawn_x, frame % 4, color)
+        return len(boards)
+    return run
+
+
+def bench_game(games, max_pieces, depth):
+    """Pieces placed per second in complete headless solo games"""
+    def run():
+        pieces = 0
+        for seed in range(games):
+            engine = play_solo(seed, max_pieces, {'depth': depth})
+            pieces += engine.ai.pieces_placed
+        return pieces
+    return run
+
+
+def run_benchmarks(min_time=0.2, depths=AI_DEPTHS, game_depths=GAME_DEPTHS, games=2,
+                   max_pieces=200):
+    """Run every benchmark and return a dictionary of named rates"""
+    benchmarks = []
+    for fill in FILL_LEVELS:
+        boards = seeded_boards(fill)
+        level = f"fill{int(fill * 100)}"
+        benchmarks.append((f"collision.{level}", "checks/s", bench_collision(boards)))
+        benchmarks.append((f"place.{level}", "placements/s", bench_place(boards)))
+        benchmarks.append((f"clear_lines.{level}", "clears/s", bench_clear(boards)))
+        benchmarks.append((f"redraw.{level}", "frames/s", bench_redraw(boards)))
+        for depth in depths:
+            benchmarks.append((f"ai.depth{depth}.{level}", "decisions/s", bench_ai(boards, depth)))
+    for depth in game_depths:
+        benchmarks.append((f"game.depth{depth}", "pieces/s", bench_game(games, max_pieces, depth)))
+
+    results = {}
+    for name, unit, function in benchmarks:
+        rate = measure(function, min_time)
+        results[name] = {'rate': round(rate, 2), 'unit': unit}
+        print(f"{name:28} {rate:14.1f} {unit}", file=sys.stderr, flush=True)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare results against a baseline
+    Returns (name, baseline rate, rate, change) for every benchmark slower than the threshold
+    """
+    regressions = []
+    for name, reference in baseline.items():
+        if name not in results or not reference['rate']:
+            continue
+        rate = results[name]['rate']
+        change = rate / reference['rate'] - 1
+        if change < -threshold:
+            regressions.append((name, reference['rate'], rate, change))
+    return regressions
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the benchmark runner"""
+    parser = argparse.ArgumentParser(description="Benchmark the engine, AI and rendering")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="also write the results to the --baseline file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown fraction reported as a regression")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds spent on each round of a benchmark")
+    parser.add_argument("--depths", type=int, nargs="+", default=list(AI_DEPTHS),
+                        help="AI search depths to benchmark")
+    parser.add_argument("--game-depths", type=int, nargs="+", default=list(GAME_DEPTHS),
+                        help="AI search depths of the full-game benchmark")
+    parser.add_argument("--games", type=int, default=2, help="headless games per run")
+    parser.add_argument("--max-pieces", type=int, default=200, help="piece limit of each game")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the benchmarks from the command line
+    Exits with status 1 when a benchmark regressed past the threshold
+    """
+    args = parse_args(argv)
+    results = run_benchmarks(
+        args.min_time, args.depths, args.game_depths, args.games, args.max_pieces
+    )
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.time(),
+        'results': results
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, 'w') as output:
+            json.dump(report, output, indent=2)
+        return 0
+
+    with open(args.baseline) as reference:
+        baseline = json.load(reference)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for name, reference_rate, rate, change in regressions:
+        print(f"REGRESSION {name}: {reference_rate:.1f} -> {rate:.1f} ({change:+.1%})",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Bitboard representation of a Tetris playfield.
+Each row is stored as an integer whose bit ``col`` is set when the cell is filled.
+"""
+
+from constants import BOARD_WIDTH, BOARD_HEIGHT
+
+
+def piece_masks(piece):
+    """
+    Convert a piece matrix into a tuple of (row offset, row mask) pairs
+    Empty rows of the matrix are skipped
+    """
+    masks = []
+    for row in range(len(piece)):
+        mask = 0
+        for col in range(len(piece[row])):
+            if piece[row][col]:
+                mask |= 1 << col
+        if mask:
+            masks.append((row, mask))
+    return tuple(masks)
+
+
+class Board:
+    def __init__(self, width=BOARD_WIDTH, height=BOARD_HEIGHT, rows=None):
+        """Initialize an empty board, or a board holding the given row masks"""
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1
+        self.rows = list(rows) if rows is not None else [0] * height
+
+        # Bumped by place and clear_rows; code writing rows directly must bump it too
+        self.version = 0
+
+        # Landing rows by (piece orientation, x), and the column surface, valid for cache_version
+        self.landings = {}
+        self.surface = None
+        self.cache_version = 0
+
+    def copy(self):
+        """Return an independent copy of the board"""
+        board = Board.__new__(Board)
+        board.width = self.width
+        board.height = self.height
+        board.full_mask = self.full_mask
+        board.rows = self.rows[:]
+        board.version = self.version
+        board.landings = {}
+        board.surface = None
+        board.cache_version = self.version
+        return board
+
+    def key(self):
+        """Return a hashable value identifying the board contents"""
+        return tuple(self.rows)
+
+    def collides(self, masks, x, y):
+        """Check if a piece collides with the board boundaries or other pieces"""
+        rows = self.rows
+        full_mask = self.full_mask
+        for dy, mask in masks:
+            row = y + dy
+            if row >= self.height:
+                return True
+
+            # Shift the piece row into board coordinates, failing on cells left of column 0
+            if x >= 0:
+                shifted = mask << x
+            else:
+                shifted = mask >> -x
+                if shifted << -x != mask:
+                    return True
+
+            # Cells right of the last column
+            if shifted & ~full_mask:
+                return True
+
+            if row >= 0 and rows[row] & shifted:
+                return True
+
+        return False
+
+    def landing(self, piece, x):
+        """
+        Return the y where a piece orientation falling from y = 0 at column x lands,
+        or -1 if it collides at y = 0
+        Computed from the column surface as the minimum over the piece's columns of
+        (surface row - bottom_profile row - 1), and cached until the board changes;
+        when that is negative, the piece starts below the surface of a column, under
+        an overhang, and is dropped row by row instead
+        """
+        if self.cache_version != self.version:
+            self.landings = {}
+            self.surface = None
+            self.cache_version = self.version
+        key = (piece, x)
+        landing = self.landings.get(key)
+        if landing is None:
+            surface = self.surface
+            if surface is None:
+                height = self.height
+                surface = self.surface = [height - h for h in self.column_heights()]
+            left = x + piece.left
+            landing = min(
+                surface[left + col] - bottom for col, bottom in enumerate(piece.bottom_profile)
+            ) - 1
+            masks = piece.masks
+            if landing < 0:
+                if self.collides(masks, x, 0):
+                    landing = -1
+                else:
+                    landing = 0
+                    while not self.collides(masks, x, landing + 1):
+                        landing += 1
+            self.landings[key] = landing
+        return landing
+
+    def drop_y(self, piece, x, y=0):
+        """
+        Return the lowest y a piece orientation can fall to from (x, y)
+        A piece at or above its landing from y = 0 falls to that same row; only a
+        piece tucked below it, under an overhang, is dropped row by row
+        """
+        landing = self.landing(piece, x)
+        if 0 <= y <= landing:
+            return landing
+        masks = piece.masks
+        while not self.collides(masks, x, y + 1):
+            y += 1
+        return y
+
+    def place(self, masks, x, y):
+        """Place a piece on the board, ignoring cells outside the playfield"""
+        rows = self.rows
+        for dy, mask in masks:
+            row = y + dy
+            if 0 <= row < self.height:
+                shifted = mask << x if x >= 0 else mask >> -x
+                rows[row] |= shifted & self.full_mask
+        self.version += 1
+
+    def clear_lines(self):
+        """Clear completed lines and return the number of lines cleared"""
+        return len(self.clear_rows())
+
+    def clear_rows(self):
+        """
+        Clear completed lines in one pass: keep the other rows in order and add
+        empty rows on top
+        Returns the indices the cleared rows had before clearing, top first
+        """
+        full_mask = self.full_mask
+        rows = self.rows
+        if full_mask not in rows:
+            return ()
+        cleared = tuple(index for index, row in enumerate(rows) if row == full_mask)
+        self.rows = [0] * len(cleared) + [row for row in rows if row != full_mask]
+        self.version += 1
+        return cleared
+
+    def column_heights(self):
+        """Get the height of each column (highest occupied cell)"""
+        heights = [0] * self.width
+        seen = 0
+        height = self.height
+        for index, row in enumerate(self.rows):
+            new = row & ~seen
+            if new:
+                seen |= new
+                while new:
+                    low = new & -new
+                    heights[low.bit_length() - 1] = height - index
+                    new ^= low
+                if seen == self.full_mask:
+                    break
+        return heights
@@ -0,0 +1,109 @@
+"""
+Bounded least-recently-used cache used by the AI search.
+Keeps hit and miss counters so the cache efficiency can be inspected, and can
+cap the approximate memory held by its items as well as their number.
+"""
+
+import sys
+from collections import OrderedDict
+
+# Range of the integers CPython allocates once and shares
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 256
+
+
+def deep_sizeof(value, skip=()):
+    """
+    Approximate the bytes held by a value and every object it references
+    Objects of the skip types, shared by many values, are not counted
+    """
+    seen = set()
+    stack = [value]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, skip):
+            continue
+        if type(item) is int and SMALL_INT_MIN <= item <= SMALL_INT_MAX:
+            # Small integers are shared by the interpreter
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(item.__dict__)
+    return size
+
+
+class LRUCache:
+    def __init__(self, max_entries, max_bytes=None, sizeof=None):
+        """
+        Initialize an empty cache holding at most max_entries items
+        With max_bytes set, items are also evicted while the sizes measured by
+        sizeof (deep_sizeof by default) add up to more than max_bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or deep_sizeof
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Return the number of cached items"""
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Get a cached value and mark it as recently used"""
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used items when full"""
+        if self.max_entries <= 0:
+            return
+        entries = self.entries
+        sizes = self.sizes
+        if self.max_bytes is not None:
+            size = self.sizeof(value)
+            self.bytes += size - sizes.get(key, 0)
+            sizes[key] = size
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and entries
+        ):
+            evicted, _ = entries.popitem(last=False)
+            self.bytes -= sizes.pop(evicted, 0)
+
+    def clear(self):
+        """Remove every item and reset the counters"""
+        self.entries.clear()
+        self.sizes.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the size and hit/miss counters of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
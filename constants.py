@@ -18,6 +18,44 @@ INITIAL_SPEED = 400  # milliseconds between piece movements
 SPEED_INCREASE = 100   # speed increase per level (ms)
 MIN_SPEED = 100       # minimum speed (ms)
 
+# Timing
+LOGIC_TIMESTEP = 10  # milliseconds of game time per logic tick
+MAX_FRAME_TIME = 250  # most game time caught up after a stall (ms)
+FAST_FORWARD_TICKS = 200  # logic ticks per frame in fast-forward mode
+RENDER_FPS = 30  # most frames drawn per second
+
+# Instrumentation
+INSTRUMENTATION_ENABLED = False  # collect hot-path metrics from startup (also TETRIS_INSTRUMENTATION=1)
+INSTRUMENTATION_DUMP_INTERVAL = 5000  # game time between metric dumps (ms)
+INSTRUMENTATION_DUMP_FILE = "instrumentation.json"  # where collected metrics are dumped
+
+# Pieces
+PIECE_POLICY = "uniform"  # how pieces are dealt: "uniform" or "bag" (7-bag)
+PREVIEW_SIZE = 3  # upcoming pieces shown to each player
+
+# Replays
+REPLAY_RECORDING = True  # record every match played in the window
+REPLAY_DIR = "replays"  # where recorded matches are written
+REPLAY_SNAPSHOT_INTERVAL = 10000  # game time between the snapshots used for seeking (ms)
+REPLAY_SEEK_STEP = 10000  # game time skipped by one seek key press (ms)
+
+# Telemetry
+TELEMETRY_ENABLED = False  # write per-event match telemetry from the window
+TELEMETRY_FILE = "telemetry.jsonl"  # .db or .sqlite writes to SQLite instead
+TELEMETRY_BUFFER_SIZE = 10000  # records held in memory before the oldest are dropped
+TELEMETRY_BATCH_SIZE = 256  # records that wake the writer thread early
+TELEMETRY_FLUSH_INTERVAL = 1.0  # longest time between writes (seconds)
+
+# Server
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7878
+SERVER_TICK = 50  # game time between match updates sent to clients (ms)
+SERVER_AI_WORKERS = 4  # threads running AI decisions for all matches
+SERVER_AI_DEPTH = 2  # deepest AI search in served matches
+SERVER_AI_CACHE_SIZE = 2000  # cached board evaluations of each match's AI
+SERVER_AI_CACHE_MEMORY = 2 * 1024 * 1024  # approximate bytes each match's AI cache may hold
+SERVER_SEND_QUEUE = 64  # messages queued for a client before it is resynced with a snapshot
+
 # Board Positions
 HUMAN_BOARD_X = 50
 AI_BOARD_X = 450
@@ -69,6 +107,10 @@ COLOR_CHANGE_INTERVAL = 120000  # 2 minutes in milliseconds
 COLOR_CHANGE_DURATION = 20000   # 20 seconds in milliseconds
 ALT_COLORS = ["#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF", "#00FFFF"] 
 FLASH_SPEED = 100 # Milliseconds. Lower = faster flashing
+LINE_CLEAR_HIGHLIGHT = 200  # how long cleared rows stay outlined (ms)
+LINE_CLEAR_COLOR = "#FFFFFF"  # outline of cleared rows
+SHOW_GHOST_PIECE = True  # outline where the human piece would land
+GHOST_OUTLINE_WIDTH = 2
 
 
 # Tetromino Shapes (representing the 7 standard tetrominos)
@@ -120,4 +162,20 @@ SHAPES = {
 
 # AI Settings
 AI_MOVE_DELAY = 100  # milliseconds between AI moves
-AI_THINKING_DEPTH = 2  # how many moves ahead AI considers
\ No newline at end of file
+AI_THINKING_DEPTH = 2  # how many moves ahead AI considers
+AI_MAX_DEPTH = 4  # deepest search of the in-game AI, which deepens while time allows
+AI_TIME_BUDGET_FRACTION = 0.5  # share of AI_MOVE_DELAY plus one gravity step spent thinking
+AI_BEAM_WIDTH = 6  # placements searched deeper at each ply
+AI_EVALUATION_CACHE_SIZE = 50000  # cached board evaluations
+AI_EVALUATION_CACHE_MEMORY = 32 * 1024 * 1024  # approximate bytes the evaluation cache may hold
+AI_USE_NUMPY = False  # score placements in NumPy batches when NumPy is installed
+AI_WEIGHTS_FILE = "ai_weights.json"  # tuned weight profile loaded at startup, if present
+BATCH_SIM_SIZE = 1024  # games the vectorized simulator plays in lockstep
+
+# Default weights of the AI board evaluation features
+AI_WEIGHTS = {
+    'completed_lines': 8.0,
+    'holes': -6,
+    'bumpiness': -2.5,
+    'aggregate_height': -0.8
+}
\ No newline at end of file
@@ -0,0 +1,379 @@
+"""
+Headless game engine for the Tetris game.
+Holds the rules, piece queue, scoring and special rules for both players
+without any dependency on Tkinter or the wall clock.
+"""
+
+import random
+from constants import (
+    INITIAL_SPEED, SLOWDOWN_BONUS_THRESHOLD, SLOWDOWN_BONUS_DURATION,
+    SLOWDOWN_PERCENTAGE, SPECIAL_PIECE_THRESHOLD, COLOR_CHANGE_INTERVAL,
+    COLOR_CHANGE_DURATION, PIECE_POLICY, PREVIEW_SIZE
+)
+from board import Board
+from pieces import get_rotation, rotate_clockwise
+from randomizer import PieceGenerator
+from movegen import LEFT, RIGHT, ROTATE, DOWN, DROP
+from score import ScoreManager
+from scheduler import TimerQueue
+from instrumentation import metrics
+
+
+class PlayerState:
+    def __init__(self, is_human):
+        """Initialize the board and falling piece of one player"""
+        self.is_human = is_human
+        self.name = "Human" if is_human else "AI"
+
+        # Bumped on every visible change, so frontends only redraw changed boards
+        self.revision = 0
+        self.reset()
+
+    def reset(self):
+        """Reset the player to an empty board"""
+        self.board = Board()
+        self.piece = None
+        self.shape = None
+        self.x = 0
+        self.y = 0
+        self.generator = None
+        self.next_shape_override = None
+        self.fall_speed = INITIAL_SPEED
+        self.is_slowed = False
+        self.slowdown_timer = None
+        self.gravity_timer = None
+        self.pieces_placed = 0
+        self.lines_cleared = 0
+        self.revision += 1
+
+
+class GameEngine:
+    def __init__(self, seed=None, policy=PIECE_POLICY, preview_size=PREVIEW_SIZE):
+        """
+        Initialize a match between a human and an AI player
+        With a seed every match replays the same pieces; without one each match
+        draws a new seed, kept in game_seed
+        """
+        self.seed = seed
+        self.policy = policy
+        self.preview_size = preview_size
+        self.game_seed = None
+        self.rng = None
+        self.score_manager = ScoreManager()
+        self.human = PlayerState(True)
+        self.ai = PlayerState(False)
+        self.listeners = []
+        self.timers = TimerQueue()
+        self.reset()
+
+    def reset(self):
+        """Reset both players, the scores and the game clock"""
+        self.clock = 0
+        self.timers.clear()
+        self.game_over = False
+        self.using_alt_colors = False
+        self.score_manager.reset_scores()
+        
+        # Both players are dealt the same sequence, so neither gets luckier pieces
+        if self.seed is not None:
+            self.game_seed = self.seed
+        else:
+            self.game_seed = random.SystemRandom().getrandbits(32)
+        self.rng = random.Random(f"{self.game_seed}-rules")
+        for player in self.players():
+            player.reset()
+            player.generator = PieceGenerator(self.game_seed, self.policy, self.preview_size)
+
+    def add_listener(self, listener):
+        """
+        Register a callback for game events
+        The callback is called as listener(event, **data)
+        """
+        self.listeners.append(listener)
+
+    def _emit(self, event, **data):
+        """Notify every listener of a game event"""
+        for listener in self.listeners:
+            listener(event, **data)
+
+    def players(self):
+        """Return both players, human first"""
+        return (self.human, self.ai)
+
+    def opponent(self, player):
+        """Return the other player"""
+        return self.ai if player is self.human else self.human
+
+    def get_score(self, player):
+        """Get the current score of a player"""
+        if player.is_human:
+            return self.score_manager.get_human_score()
+        return self.score_manager.get_ai_score()
+
+    def start(self):
+        """Reset the match, spawn the first piece of each player and start the timers"""
+        self.reset()
+        self._emit('start')
+        for player in self.players():
+            if not self.spawn(player):
+                return
+            player.gravity_timer = self.schedule(player.fall_speed, self._gravity, player)
+        self.schedule(COLOR_CHANGE_INTERVAL, self._start_color_change)
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after delay milliseconds of game time"""
+        return self.timers.schedule(self.clock + delay, callback, *args)
+
+    def _gravity(self, player):
+        """Apply a gravity step, then schedule the next one at the current fall speed"""
+        self.step(player)
+        if not self.game_over:
+            player.gravity_timer = self.schedule(player.fall_speed, self._gravity, player)
+
+    def spawn(self, player):
+        """
+        Spawn the next piece for a player
+        Returns False, and ends the game, if the new piece cannot be placed
+        """
+        # Check if there's an override (for special rules)
+        if player.next_shape_override:
+            player.shape = player.next_shape_override
+            player.next_shape_override = None
+        else:
+            # Take the first previewed tetromino
+            player.shape = player.generator.next()
+
+        # Get the tetromino shape in its spawn orientation
+        player.piece = get_rotation(player.shape)
+
+        # Starting position
+        player.x = player.piece.spawn_x
+        player.y = 0
+
+        player.revision += 1
+
+        # Check if the new piece can be placed
+        if player.board.collides(player.piece.masks, player.x, player.y):
+            self._end_game(player)
+            return False
+
+        self._emit('spawn', player=player)
+        return True
+
+    def upcoming_shape(self, player):
+        """Return the shape the player will receive after the current piece"""
+        return self.preview(player)[0]
+
+    def preview(self, player):
+        """Return the shapes the player will receive next, including any override"""
+        shapes = player.generator.preview()
+        if player.next_shape_override:
+            shapes = (player.next_shape_override,) + shapes[:-1]
+        return shapes
+
+    def can_move(self, player, dx, dy, piece=None):
+        """Check whether the player's piece can be shifted by (dx, dy)"""
+        piece = piece or player.piece
+        metrics.count('engine.collision_checks')
+        return not player.board.collides(piece.masks, player.x + dx, player.y + dy)
+
+    def move(self, player, dx, dy=0):
+        """Shift the player's piece if there is room; returns whether it moved"""
+        if self.game_over or not self.can_move(player, dx, dy):
+            return False
+        player.x += dx
+        player.y += dy
+        player.revision += 1
+        return True
+
+    def rotate(self, player):
+        """Rotate the player's piece clockwise if there is room; returns whether it rotated"""
+        if self.game_over:
+            return False
+        new_piece = rotate_clockwise(player.piece)
+        if not self.can_move(player, 0, 0, new_piece):
+            return False
+        player.piece = new_piece
+        player.revision += 1
+        return True
+
+    def hard_drop(self, player):
+        """Drop the player's piece as far as it can fall; returns whether it was dropped"""
+        if self.game_over:
+            return False
+        player.y = player.board.drop_y(player.piece, player.x, player.y)
+        player.revision += 1
+        return True
+
+    def apply_move(self, player, rotation, x):
+        """
+        Rotate the player's piece to the given orientation, then slide it to column x
+        Rotations and moves that collide are skipped
+        Returns True if the piece reached the requested position
+        """
+        turns = (rotation - player.piece.rotation) % 4
+        for _ in range(turns):
+            self.rotate(player)
+
+        # Move horizontally
+        while player.x < x and self.move(player, 1):
+            pass
+        while player.x > x and self.move(player, -1):
+            pass
+
+        return player.x == x and player.piece.rotation == rotation
+    
+    def input(self, player, move):
+        """
+        Play one input ('left', 'right', 'rotate', 'down' or 'drop') for a player
+        Every input of a human or AI player goes through here and is announced
+        with an 'input' event, so a match can be recorded and replayed
+        Returns whether the input changed the piece
+        """
+        self._emit('input', player=player, move=move)
+        if move == LEFT:
+            return self.move(player, -1)
+        if move == RIGHT:
+            return self.move(player, 1)
+        if move == ROTATE:
+            return self.rotate(player)
+        if move == DOWN:
+            return self.move(player, 0, 1)
+        if move == DROP:
+            return self.hard_drop(player)
+        raise ValueError(f"Unknown input: {move}")
+    
+    def apply_path(self, player, path):
+        """
+        Play a sequence of inputs for a player
+        Stops at the first input that cannot be played
+        Returns True if every input was played
+        """
+        for move in path:
+            if not self.input(player, move):
+                return False
+        return True
+
+    def step(self, player):
+        """
+        Apply one gravity step to a player
+        The piece moves down one row, or locks when it cannot fall any further
+        Returns True if the piece locked
+        """
+        if self.game_over:
+            return False
+        if self.move(player, 0, 1):
+            return False
+        self.lock(player)
+        return True
+
+    def lock(self, player):
+        """Lock the player's piece, clear lines, apply scoring and spawn the next piece"""
+        # Place the piece on the board and check for completed lines
+        player.board.place(player.piece.masks, player.x, player.y)
+        with metrics.timer('engine.clear_lines'):
+            cleared_rows = player.board.clear_rows()
+        lines_cleared = len(cleared_rows)
+        player.pieces_placed += 1
+        player.lines_cleared += lines_cleared
+        player.revision += 1
+
+        # Update score and check for special actions
+        if player.is_human:
+            score_added = self.score_manager.update_human_score(lines_cleared)
+        else:
+            score_added = self.score_manager.update_ai_score(lines_cleared)
+        self._emit(
+            'lock', player=player, lines_cleared=lines_cleared, points=score_added,
+            rows=cleared_rows
+        )
+
+        # Check for special rules
+        self._check_special_rules(player, lines_cleared, score_added)
+
+        # Create a new piece
+        self.spawn(player)
+
+    def _check_special_rules(self, player, lines_cleared, score_added):
+        """Check and apply special rules based on game events"""
+        opponent = self.opponent(player)
+
+        # Surprise Gift: Clearing 2 lines grants the opponent an easy piece
+        if lines_cleared == 2:
+            # Next piece for opponent will be easy (I or O shape)
+            opponent.next_shape_override = self.rng.choice(['I', 'O'])
+            self._emit('gift', player=opponent, shape=opponent.next_shape_override)
+
+        # Slowdown Bonus: Every 1000 points, pieces fall 20% slower for 10 seconds
+        current_score = self.get_score(player)
+        if current_score // SLOWDOWN_BONUS_THRESHOLD > (current_score - score_added) // SLOWDOWN_BONUS_THRESHOLD:
+            self._activate_slowdown()
+
+        # Special Piece: Every 3000 points, a unique-shaped piece appears
+        if current_score // SPECIAL_PIECE_THRESHOLD > (current_score - score_added) // SPECIAL_PIECE_THRESHOLD:
+            player.next_shape_override = 'SPECIAL'
+            self._emit('special_piece', player=player)
+
+    def _activate_slowdown(self):
+        """Activate the slowdown bonus for both players"""
+        for player in self.players():
+            if not player.is_slowed:
+                player.is_slowed = True
+                player.fall_speed = int(player.fall_speed / SLOWDOWN_PERCENTAGE)
+            self.timers.cancel(player.slowdown_timer)
+            player.slowdown_timer = self.schedule(
+                SLOWDOWN_BONUS_DURATION, self._end_slowdown, player
+            )
+        self._emit('slowdown_start')
+
+    def _end_slowdown(self, player):
+        """End the slowdown bonus for a player"""
+        player.is_slowed = False
+        player.slowdown_timer = None
+        player.fall_speed = int(player.fall_speed * SLOWDOWN_PERCENTAGE)
+        self._emit('slowdown_end', player=player)
+
+    def _end_game(self, player):
+        """End the match because a player's new piece could not be placed"""
+        self.game_over = True
+        self._emit('game_over', player=player)
+
+    def winner(self):
+        """Return the player with the higher score, or None on a tie"""
+        human_score = self.score_manager.get_human_score()
+        ai_score = self.score_manager.get_ai_score()
+        if human_score > ai_score:
+            return self.human
+        if ai_score > human_score:
+            return self.ai
+        return None
+
+    def _start_color_change(self):
+        """Start the color change effect and schedule its end and the next one"""
+        self.using_alt_colors = True
+        self.schedule(COLOR_CHANGE_DURATION, self._end_color_change)
+        self.schedule(COLOR_CHANGE_INTERVAL, self._start_color_change)
+        self._emit('color_change_start')
+
+    def _end_color_change(self):
+        """End the color change effect"""
+        self.using_alt_colors = False
+        self._emit('color_change_end')
+
+    def set_time(self, ms):
+        """
+        Move the game clock forward to ms, running every timer that falls due
+        Gravity steps and timed effects run in time order; nothing runs after game over
+        """
+        while not self.game_over:
+            timer = self.timers.pop_due(ms)
+            if timer is None:
+                break
+            due, callback, args = timer
+            self.clock = max(self.clock, due)
+            callback(*args)
+        self.clock = max(self.clock, ms)
+
+    def advance(self, ms):
+        """Run the match for ms milliseconds of game time without a display"""
+        self.set_time(self.clock + ms)
@@ -0,0 +1,157 @@
+"""
+Incrementally maintained board features used by the AI evaluation.
+Placing a piece or clearing lines updates only the affected columns and rows.
+"""
+
+
+class BoardFeatures:
+    def __init__(self, width, height):
+        """Initialize the features of an empty board"""
+        self.width = width
+        self.height = height
+        self.heights = [0] * width
+        self.holes = [0] * width
+        self.row_fill = [0] * height
+        self.aggregate_height = 0
+        self.total_holes = 0
+        self.bumpiness = 0
+        self.completed_lines = 0
+
+    @classmethod
+    def from_board(cls, board):
+        """Compute the features of a board with a full scan"""
+        features = cls(board.width, board.height)
+        features.row_fill = [bin(row).count("1") for row in board.rows]
+        features.completed_lines = features.row_fill.count(board.width)
+        for col in range(board.width):
+            features._rescan_column(board, col)
+        features.aggregate_height = sum(features.heights)
+        features.total_holes = sum(features.holes)
+        features.bumpiness = features._full_bumpiness()
+        return features
+
+    def copy(self):
+        """Return an independent copy of the features"""
+        features = BoardFeatures.__new__(BoardFeatures)
+        features.width = self.width
+        features.height = self.height
+        features.heights = self.heights[:]
+        features.holes = self.holes[:]
+        features.row_fill = self.row_fill[:]
+        features.aggregate_height = self.aggregate_height
+        features.total_holes = self.total_holes
+        features.bumpiness = self.bumpiness
+        features.completed_lines = self.completed_lines
+        return features
+
+    def place(self, piece, x, y):
+        """Update the features for a piece placed at (x, y), in O(piece size)"""
+        heights = self.heights
+        holes = self.holes
+        row_fill = self.row_fill
+        width = self.width
+
+        # Group the new cell heights by column
+        columns = {}
+        for row, col in piece.cells:
+            board_row = y + row
+            row_fill[board_row] += 1
+            if row_fill[board_row] == width:
+                self.completed_lines += 1
+            columns.setdefault(x + col, []).append(self.height - board_row)
+
+        for col, cell_heights in columns.items():
+            old_height = heights[col]
+            above = 0
+            top = old_height
+            for cell_height in cell_heights:
+                if cell_height <= old_height:
+                    # The cell fills an existing hole
+                    holes[col] -= 1
+                    self.total_holes -= 1
+                else:
+                    above += 1
+                    if cell_height > top:
+                        top = cell_height
+            if top > old_height:
+                # Empty cells skipped between the old surface and the new top become holes
+                new_holes = top - old_height - above
+                holes[col] += new_holes
+                self.total_holes += new_holes
+                self._set_height(col, top)
+
+    def clear_lines(self, board, cleared=None):
+        """
+        Update the features for the removal of every completed row
+        The board must already have its lines cleared; cleared may give the row
+        indices returned by Board.clear_rows. Columns keeping cells above every
+        cleared row only shift down; the others are rescanned from the top cleared
+        row down, as nothing is left above it, so the cost is O(width x rows at or
+        below the top cleared row)
+        """
+        row_fill = self.row_fill
+        if cleared is None:
+            cleared = [row for row in range(self.height) if row_fill[row] == self.width]
+        if not cleared:
+            return 0
+
+        lines_cleared = len(cleared)
+        top_cleared = cleared[0]
+        for col in range(self.width):
+            top_row = self.height - self.heights[col]
+            if top_row < top_cleared:
+                # Filled cells remain above every cleared row
+                self._set_height(col, self.heights[col] - lines_cleared)
+            else:
+                # The column top was cleared, exposing whatever lies below; the rows
+                # above the top cleared row, now shifted down, are empty in it
+                self.total_holes -= self.holes[col]
+                self._rescan_column(
+                    board, col, update_aggregates=True, start=top_cleared + lines_cleared
+                )
+                self.total_holes += self.holes[col]
+
+        self.row_fill = [0] * lines_cleared + [
+            fill for fill in row_fill if fill != self.width
+        ]
+        self.completed_lines = 0
+        return lines_cleared
+
+    def _set_height(self, col, height):
+        """Change a column height, keeping the aggregate height and bumpiness in sync"""
+        heights = self.heights
+        old_height = heights[col]
+        bumpiness = self.bumpiness
+        if col > 0:
+            bumpiness += abs(height - heights[col - 1]) - abs(old_height - heights[col - 1])
+        if col < self.width - 1:
+            bumpiness += abs(height - heights[col + 1]) - abs(old_height - heights[col + 1])
+        self.bumpiness = bumpiness
+        self.aggregate_height += height - old_height
+        heights[col] = height
+
+    def _rescan_column(self, board, col, update_aggregates=False, start=0):
+        """
+        Recompute the height and hole count of one column from the board
+        Rows above start must be empty in the column
+        """
+        bit = 1 << col
+        rows = board.rows
+        height = 0
+        holes = 0
+        for index in range(start, board.height):
+            if rows[index] & bit:
+                if not height:
+                    height = board.height - index
+            elif height:
+                holes += 1
+        self.holes[col] = holes
+        if update_aggregates:
+            self._set_height(col, height)
+        else:
+            self.heights[col] = height
+
+    def _full_bumpiness(self):
+        """Calculate the sum of height differences between adjacent columns"""
+        heights = self.heights
+        return sum(abs(heights[i] - heights[i + 1]) for i in range(self.width - 1))
@@ -0,0 +1,153 @@
+"""
+Opt-in instrumentation for the game's hot paths.
+Collects counters, gauges and timing histograms that can be shown in the debug
+overlay or dumped to JSON. Disabled by default, so it costs a flag check.
+Metrics may be recorded from several threads, such as the AI worker, while the
+Tk thread reads them, so every access holds a lock.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from constants import INSTRUMENTATION_ENABLED
+
+# Upper bounds of the timing histogram buckets, in milliseconds
+BUCKET_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+
+
+class TimingHistogram:
+    def __init__(self):
+        """Initialize an empty histogram of durations"""
+        self.buckets = [0] * len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, ms):
+        """Add one duration in milliseconds"""
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Estimate a percentile as the upper bound of the bucket that contains it"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """Return the histogram statistics as a dictionary"""
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'min_ms': self.min if self.count else 0.0,
+            'max_ms': self.max,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': {
+                str(bound): count for bound, count in zip(BUCKET_BOUNDS, self.buckets) if count
+            }
+        }
+
+
+class Instrumentation:
+    def __init__(self, enabled=False):
+        """Initialize empty metrics"""
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard every recorded metric"""
+        with self.lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+    def count(self, name, amount=1):
+        """Increase a counter"""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, value):
+        """Set a gauge to its latest value"""
+        if self.enabled:
+            with self.lock:
+                self.gauges[name] = value
+
+    def record(self, name, ms):
+        """Add a duration in milliseconds to a timing histogram"""
+        if self.enabled:
+            with self.lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = TimingHistogram()
+                histogram.record(ms)
+
+    @contextmanager
+    def timer(self, name):
+        """Time the body of a with block into a histogram"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        """Return every metric as a JSON-serializable dictionary"""
+        with self.lock:
+            return {
+                'time': time.time(),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'timings': {
+                    name: histogram.summary() for name, histogram in self.histograms.items()
+                }
+            }
+
+    def dump(self, path):
+        """Write a snapshot of the metrics to a JSON file"""
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'w') as output:
+            json.dump(self.snapshot(), output, indent=2)
+        os.replace(temporary_path, path)
+
+    def overlay_lines(self):
+        """Return short text lines summarizing the metrics for the debug overlay"""
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        lines = []
+        ticks = counters.get('engine.ticks', 0)
+        if ticks:
+            checks = counters.get('engine.collision_checks', 0)
+            lines.append(f"collision checks/tick: {checks / ticks:.2f}")
+        for name, summary in sorted(snapshot['timings'].items()):
+            lines.append(
+                f"{name}: n={summary['count']} mean={summary['mean_ms']:.2f}ms "
+                f"p95={summary['p95_ms']:.2f}ms"
+            )
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+
+# Shared metrics, enabled by INSTRUMENTATION_ENABLED or the TETRIS_INSTRUMENTATION variable
+metrics = Instrumentation(
+    INSTRUMENTATION_ENABLED or os.environ.get("TETRIS_INSTRUMENTATION") == "1"
+)
@@ -0,0 +1,126 @@
+"""
+Move generation by breadth-first search over piece states.
+Finds every position a piece can lock in with the game's own moves (shift,
+rotate without kicks, soft and hard drop), including tucks and slides under
+overhangs, together with the shortest input path that reaches it.
+"""
+
+from collections import deque
+from pieces import ROTATIONS
+
+# Inputs understood by GameEngine.apply_path
+LEFT = 'left'
+RIGHT = 'right'
+ROTATE = 'rotate'
+DOWN = 'down'
+DROP = 'drop'
+
+
+def _open_y(board, shape):
+    """
+    Return the lowest y at which every orientation of a shape is clear of the stack
+    Above it only the walls block a piece, so every state there behaves the same
+    """
+    top = next((row for row, mask in enumerate(board.rows) if mask), board.height)
+    return top - 1 - max(piece.bottom for piece in ROTATIONS[shape])
+
+
+def _neighbours(board, piece, x, y, open_y):
+    """Yield the (inputs, piece, x, y) states one move away from a state"""
+    masks = piece.masks
+    if not board.collides(masks, x - 1, y):
+        yield (LEFT,), piece, x - 1, y
+    if not board.collides(masks, x + 1, y):
+        yield (RIGHT,), piece, x + 1, y
+
+    rotated = ROTATIONS[piece.shape][(piece.rotation + 1) % len(ROTATIONS[piece.shape])]
+    if not board.collides(rotated.masks, x, y):
+        yield (ROTATE,), rotated, x, y
+
+    if not board.collides(masks, x, y + 1):
+        if y < open_y:
+            # Rows above the stack add no new options, so fall straight past them
+            yield (DOWN,) * (open_y - y), piece, x, open_y
+        else:
+            yield (DOWN,), piece, x, y + 1
+        drop_y = board.drop_y(piece, x, y + 1)
+        if drop_y > y + 1:
+            yield (DROP,), piece, x, drop_y
+
+
+def _explore(board, piece, x, y):
+    """
+    Visit every state reachable from (piece, x, y), nearest first
+    Yields (piece, x, y, parents) for each state; parents maps a state to (previous state, inputs)
+    """
+    open_y = _open_y(board, piece.shape)
+    start = (piece.rotation, x, y)
+    parents = {start: None}
+    queue = deque([(piece, x, y)])
+    while queue:
+        piece, x, y = queue.popleft()
+        yield piece, x, y, parents
+        state = (piece.rotation, x, y)
+        for inputs, next_piece, next_x, next_y in _neighbours(board, piece, x, y, open_y):
+            next_state = (next_piece.rotation, next_x, next_y)
+            if next_state not in parents:
+                parents[next_state] = (state, inputs)
+                queue.append((next_piece, next_x, next_y))
+
+
+def _path(parents, state):
+    """Rebuild the inputs leading from the start state to a state"""
+    moves = []
+    while parents[state] is not None:
+        state, inputs = parents[state]
+        moves.append(inputs)
+    moves.reverse()
+    return tuple(move for inputs in moves for move in inputs)
+
+
+def placement_key(piece, x, y):
+    """Identify a placement by the board cells it fills, so equal placements compare equal"""
+    return tuple(
+        (y + dy, mask << x if x >= 0 else mask >> -x) for dy, mask in piece.masks
+    )
+
+
+def reachable_placements(board, piece, x, y):
+    """
+    Find every distinct position the piece can lock in, starting from (x, y)
+    Returns (piece, x, y, path) tuples in the order the search reaches them, fewest
+    moves first, counting a fall past the empty rows above the stack as one move;
+    placements that fill the same cells, e.g. the rotations of the O piece, are
+    listed once
+    """
+    placements = []
+    seen = set()
+    for piece, x, y, parents in _explore(board, piece, x, y):
+        if not board.collides(piece.masks, x, y + 1):
+            continue
+        key = placement_key(piece, x, y)
+        if key not in seen:
+            seen.add(key)
+            placements.append((piece, x, y, _path(parents, (piece.rotation, x, y))))
+    return placements
+
+
+def find_path(board, piece, x, y, target_piece, target_x, target_y):
+    """
+    Find the shortest input path from (piece, x, y) to a placement
+    Any orientation filling the same cells as the target is accepted
+    Returns None if the placement cannot be reached
+    """
+    target = placement_key(target_piece, target_x, target_y)
+    for piece, x, y, parents in _explore(board, piece, x, y):
+        if placement_key(piece, x, y) == target:
+            return _path(parents, (piece.rotation, x, y))
+    return None
+
+
+def trim_drop(path):
+    """Remove the trailing drops of a path, leaving the rest of the fall to gravity"""
+    end = len(path)
+    while end and path[end - 1] in (DOWN, DROP):
+        end -= 1
+    return path[:end]
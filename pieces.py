@@ -0,0 +1,108 @@
+"""
+Precomputed rotation and placement tables for the shapes in constants.SHAPES.
+Built once at import time so rotation and placement queries become lookups.
+"""
+
+from constants import BOARD_WIDTH, SHAPES
+from board import piece_masks
+
+ROTATION_COUNT = 4
+
+# The seven standard tetrominoes, excluding the special piece
+TETROMINOES = tuple(shape for shape in SHAPES if shape != 'SPECIAL')
+
+
+def _rotate_matrix(matrix):
+    """Rotate a piece matrix 90 degrees clockwise"""
+    rows = len(matrix)
+    cols = len(matrix[0])
+    return tuple(
+        tuple(matrix[rows - 1 - row][col] for row in range(rows))
+        for col in range(cols)
+    )
+
+
+class PieceRotation:
+    def __init__(self, shape, rotation, matrix):
+        """Precompute the geometry of one orientation of a piece"""
+        self.shape = shape
+        self.rotation = rotation
+        self.matrix = matrix
+        self.masks = piece_masks(matrix)
+
+        # Filled cells as (row, col) offsets inside the matrix
+        self.cells = tuple(
+            (row, col)
+            for row in range(len(matrix))
+            for col in range(len(matrix[row]))
+            if matrix[row][col]
+        )
+
+        # Trimmed bounding box in matrix coordinates
+        self.top = min(row for row, _ in self.cells)
+        self.bottom = max(row for row, _ in self.cells)
+        self.left = min(col for _, col in self.cells)
+        self.right = max(col for _, col in self.cells)
+        self.width = self.right - self.left + 1
+        self.height = self.bottom - self.top + 1
+
+        # Lowest filled row offset of each occupied column, from left to right
+        self.bottom_profile = tuple(
+            max(row for row, col in self.cells if col == column)
+            for column in range(self.left, self.right + 1)
+        )
+
+        # Legal x range for the matrix origin, and the spawn column
+        self.min_x = -self.left
+        self.max_x = BOARD_WIDTH - 1 - self.right
+        self.spawn_x = BOARD_WIDTH // 2 - len(matrix[0]) // 2
+
+        # Shape with the bounding box trimmed away, used to spot duplicates
+        self.normalized = tuple(
+            (dy - self.top, mask >> self.left) for dy, mask in self.masks
+        )
+
+    def __deepcopy__(self, memo):
+        """Orientations are shared and never modified, so copies of a game keep them"""
+        return self
+
+    def x_positions(self):
+        """Return every x where the piece fits horizontally on the board"""
+        return range(self.min_x, self.max_x + 1)
+
+
+def _build_tables():
+    """Build the rotation cycle and the distinct rotations of every shape"""
+    rotations = {}
+    distinct = {}
+    for shape, matrices in SHAPES.items():
+        matrix = tuple(tuple(row) for row in matrices[0])
+        cycle = []
+        for rotation in range(ROTATION_COUNT):
+            cycle.append(PieceRotation(shape, rotation, matrix))
+            matrix = _rotate_matrix(matrix)
+        rotations[shape] = tuple(cycle)
+
+        unique = []
+        seen = set()
+        for piece in cycle:
+            if piece.normalized not in seen:
+                seen.add(piece.normalized)
+                unique.append(piece)
+        distinct[shape] = tuple(unique)
+    return rotations, distinct
+
+
+# ROTATIONS[shape][r] is the spawn orientation turned clockwise r times;
+# DISTINCT_ROTATIONS[shape] keeps the first of each set of identical orientations
+ROTATIONS, DISTINCT_ROTATIONS = _build_tables()
+
+
+def get_rotation(shape, rotation=0):
+    """Get a shape turned clockwise the given number of times"""
+    return ROTATIONS[shape][rotation % ROTATION_COUNT]
+
+
+def rotate_clockwise(piece):
+    """Get the orientation following a piece in the clockwise rotation cycle"""
+    return ROTATIONS[piece.shape][(piece.rotation + 1) % ROTATION_COUNT]
@@ -0,0 +1,61 @@
+"""
+Seeded piece generators for the Tetris game.
+Each player draws from its own generator, whose policy decides the sequence
+(uniform or 7-bag) and which keeps a queue of previewed pieces.
+"""
+
+import random
+from collections import deque
+from pieces import TETROMINOES
+
+
+class UniformPolicy:
+    def __init__(self, shapes=TETROMINOES):
+        """Draw every shape with the same probability, independently of the past"""
+        self.shapes = tuple(shapes)
+
+    def draw(self, rng):
+        """Return the next shape"""
+        return rng.choice(self.shapes)
+
+
+class BagPolicy:
+    def __init__(self, shapes=TETROMINOES):
+        """Deal the shapes from shuffled bags holding one of each"""
+        self.shapes = tuple(shapes)
+        self.bag = []
+
+    def draw(self, rng):
+        """Return the next shape, starting a new shuffled bag when the last one is empty"""
+        if not self.bag:
+            self.bag = list(self.shapes)
+            rng.shuffle(self.bag)
+        return self.bag.pop()
+
+
+POLICIES = {
+    'uniform': UniformPolicy,
+    'bag': BagPolicy
+}
+
+
+class PieceGenerator:
+    def __init__(self, seed=None, policy='uniform', preview_size=1):
+        """
+        Initialize a generator with its own random stream
+        The same seed and policy always produce the same sequence of shapes
+        """
+        self.rng = random.Random(seed)
+        self.policy = POLICIES[policy]()
+        self.preview_size = max(1, preview_size)
+        self.queue = deque(self.policy.draw(self.rng) for _ in range(self.preview_size))
+
+    def next(self):
+        """Take the next shape and draw a new one into the preview queue"""
+        shape = self.queue.popleft()
+        self.queue.append(self.policy.draw(self.rng))
+        return shape
+
+    def preview(self):
+        """Return the upcoming shapes, next first, without taking them"""
+        return tuple(self.queue)
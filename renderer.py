@@ -0,0 +1,143 @@
+"""
+Persistent canvas rendering of a Tetris board.
+Creates one rectangle per board cell and small pools of items for the falling
+piece and its ghost once, then only reconfigures the items whose appearance changed.
+"""
+
+from constants import BOARD_WIDTH, BOARD_HEIGHT, BLOCK_SIZE, GRID_COLOR, SHAPES, GHOST_OUTLINE_WIDTH
+
+# The falling piece never has more cells than the largest shape
+PIECE_ITEM_COUNT = max(
+    sum(1 for row in SHAPES[shape][0] for cell in row if cell) for shape in SHAPES
+)
+
+EMPTY_FILL = ""
+
+
+class BoardRenderer:
+    def __init__(self, canvas, board_x, board_y, tag, ghost=False):
+        """
+        Create the cell and falling piece items of a board once
+        With ghost set, an outline shows where the falling piece would land
+        """
+        self.canvas = canvas
+        self.board_x = board_x
+        self.board_y = board_y
+        self.tag = tag
+
+        # One rectangle per cell, drawing both the grid and the locked blocks
+        self.cell_items = [
+            [
+                canvas.create_rectangle(
+                    *self._cell_coords(row, col),
+                    outline=GRID_COLOR, width=1, fill=EMPTY_FILL, tags=tag
+                )
+                for col in range(BOARD_WIDTH)
+            ]
+            for row in range(BOARD_HEIGHT)
+        ]
+
+        # Outlines for the ghost piece, created before the piece so it is drawn on top
+        self.ghost = ghost
+        self.ghost_items = [
+            canvas.create_rectangle(
+                0, 0, BLOCK_SIZE, BLOCK_SIZE,
+                outline="", width=GHOST_OUTLINE_WIDTH, fill=EMPTY_FILL, state="hidden", tags=tag
+            )
+            for _ in range(PIECE_ITEM_COUNT if ghost else 0)
+        ]
+
+        # Movable items for the falling piece, hidden until used
+        self.piece_items = [
+            canvas.create_rectangle(
+                0, 0, BLOCK_SIZE, BLOCK_SIZE,
+                outline="white", fill=EMPTY_FILL, state="hidden", tags=tag
+            )
+            for _ in range(PIECE_ITEM_COUNT)
+        ]
+
+        # What is currently shown, used to skip unchanged boards and items
+        self.drawn_state = None
+        self.drawn_rows = [0] * BOARD_HEIGHT
+        self.drawn_color = None
+        self.drawn_piece = None
+        self.visible_piece_items = 0
+        self.highlighted_rows = ()
+
+    def _cell_coords(self, row, col):
+        """Get the canvas rectangle of a board cell"""
+        x = self.board_x + col * BLOCK_SIZE
+        y = self.board_y + row * BLOCK_SIZE
+        return x, y, x + BLOCK_SIZE, y + BLOCK_SIZE
+
+    def render(self, board, piece, piece_x, piece_y, color):
+        """Update the canvas to show a board and its falling piece"""
+        self._render_cells(board, color)
+        self._render_piece(board, piece, piece_x, piece_y, color)
+
+    def _render_cells(self, board, color):
+        """Refill only the cells whose state or color changed since the last frame"""
+        canvas = self.canvas
+        recolor = color != self.drawn_color
+        for row, mask in enumerate(board.rows):
+            drawn_mask = self.drawn_rows[row]
+            if recolor:
+                # Every filled cell, plus any cell that changed, needs a new fill
+                changed = mask | (mask ^ drawn_mask)
+            else:
+                changed = mask ^ drawn_mask
+            if not changed:
+                continue
+
+            items = self.cell_items[row]
+            while changed:
+                low = changed & -changed
+                col = low.bit_length() - 1
+                canvas.itemconfig(items[col], fill=color if mask & low else EMPTY_FILL)
+                changed ^= low
+            self.drawn_rows[row] = mask
+        self.drawn_color = color
+
+    def _render_piece(self, board, piece, piece_x, piece_y, color):
+        """
+        Move the falling piece items, hiding the ones the piece does not use
+        The ghost row comes from the board's cached landing rows, so it is only
+        looked up when the piece or board changed
+        """
+        state = (piece, piece_x, piece_y, color, board.version)
+        if state == self.drawn_piece:
+            return
+        self.drawn_piece = state
+
+        canvas = self.canvas
+        cells = piece.cells if piece else ()
+        if self.ghost and piece:
+            ghost_y = board.drop_y(piece, piece_x, piece_y)
+            for item, (row, col) in zip(self.ghost_items, cells):
+                canvas.coords(item, *self._cell_coords(ghost_y + row, piece_x + col))
+                canvas.itemconfig(item, outline=color, state="normal")
+        for item, (row, col) in zip(self.piece_items, cells):
+            canvas.coords(item, *self._cell_coords(piece_y + row, piece_x + col))
+            canvas.itemconfig(item, fill=color, state="normal")
+        for start in range(len(cells), self.visible_piece_items):
+            canvas.itemconfig(self.piece_items[start], state="hidden")
+            if self.ghost:
+                canvas.itemconfig(self.ghost_items[start], state="hidden")
+        self.visible_piece_items = len(cells)
+
+    def highlight_rows(self, rows, color):
+        """Outline the cells of some rows, e.g. the rows of lines just cleared"""
+        self.clear_highlight()
+        canvas = self.canvas
+        for row in rows:
+            for item in self.cell_items[row]:
+                canvas.itemconfig(item, outline=color)
+        self.highlighted_rows = tuple(rows)
+
+    def clear_highlight(self):
+        """Restore the grid outline of highlighted rows"""
+        canvas = self.canvas
+        for row in self.highlighted_rows:
+            for item in self.cell_items[row]:
+                canvas.itemconfig(item, outline=GRID_COLOR)
+        self.highlighted_rows = ()
@@ -0,0 +1,411 @@
+"""
+Compact replay recording and playback for Tetris matches.
+A replay stores the seed and every input, spawn and lock of a match as varint
+encoded records; ReplayPlayer re-simulates it on the headless engine, seeking
+through periodic snapshots, and ReplayViewer plays it back in a Tk window.
+
+Usage: python -m replay replays/match.trpl [--headless]
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+from constants import (
+    SHAPES, PIECE_COLORS, REPLAY_DIR, REPLAY_SNAPSHOT_INTERVAL, REPLAY_SEEK_STEP,
+    WINDOW_WIDTH, WINDOW_HEIGHT, BACKGROUND_COLOR, TEXT_COLOR, HUMAN_BOARD_X,
+    AI_BOARD_X, BOARD_Y, BOARD_WIDTH, BOARD_HEIGHT, BLOCK_SIZE, BORDER_COLOR, RENDER_FPS
+)
+from engine import GameEngine
+from movegen import LEFT, RIGHT, ROTATE, DOWN, DROP
+from renderer import BoardRenderer
+
+MAGIC = b"TRPL"
+FORMAT_VERSION = 1
+
+# Record types
+INPUT = 1
+SPAWN = 2
+LOCK = 3
+END = 4
+
+MOVES = (LEFT, RIGHT, ROTATE, DOWN, DROP)
+SHAPE_NAMES = tuple(SHAPES)
+
+
+def write_varint(output, value):
+    """Write a non-negative integer in 7-bit groups, low group first"""
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            break
+    output.write(data)
+
+
+def read_varint(data, offset):
+    """Read a varint from data at offset; returns (value, next offset)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value):
+    """Map a signed integer to a non-negative one, small magnitudes first"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    """Invert zigzag"""
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+class ReplayRecorder:
+    def __init__(self, engine, directory=REPLAY_DIR):
+        """Record every match the engine plays to a new file in directory"""
+        self.engine = engine
+        self.directory = directory
+        self.output = None
+        self.path = None
+        self.last_clock = 0
+        engine.add_listener(self._on_event)
+
+    def _on_event(self, event, player=None, **data):
+        """Append the record of a game event"""
+        if event == 'start':
+            self._open()
+        elif self.output is None:
+            return
+        elif event == 'input':
+            self._record(INPUT, self._player_index(player), MOVES.index(data['move']))
+        elif event == 'spawn':
+            self._record(SPAWN, self._player_index(player), SHAPE_NAMES.index(player.shape))
+        elif event == 'lock':
+            self._record(
+                LOCK, self._player_index(player), zigzag(player.x), player.y,
+                player.piece.rotation, data['lines_cleared']
+            )
+        elif event == 'game_over':
+            self._record(END, self._player_index(player))
+            self.close()
+
+    def _open(self):
+        """Start the file of a new match with its header"""
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{self.engine.game_seed}.trpl"
+        self.path = os.path.join(self.directory, name)
+        self.output = open(self.path, 'wb')
+        self.output.write(MAGIC)
+        write_varint(self.output, FORMAT_VERSION)
+        write_varint(self.output, self.engine.game_seed)
+        policy = self.engine.policy.encode()
+        write_varint(self.output, len(policy))
+        self.output.write(policy)
+        write_varint(self.output, self.engine.preview_size)
+        self.last_clock = 0
+
+    def _player_index(self, player):
+        """Return 0 for the human player and 1 for the AI"""
+        return 0 if player.is_human else 1
+
+    def _record(self, kind, *fields):
+        """Write a record: its type, the game time since the last record, then its fields"""
+        write_varint(self.output, kind)
+        write_varint(self.output, self.engine.clock - self.last_clock)
+        self.last_clock = self.engine.clock
+        for field in fields:
+            write_varint(self.output, field)
+
+    def close(self):
+        """Finish the current file"""
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+
+class Replay:
+    FIELD_COUNTS = {INPUT: 2, SPAWN: 2, LOCK: 5, END: 1}
+
+    def __init__(self, seed, policy, preview_size, records):
+        """Hold a decoded replay: the match settings and its (type, clock, fields) records"""
+        self.seed = seed
+        self.policy = policy
+        self.preview_size = preview_size
+        self.records = records
+
+    @classmethod
+    def load(cls, path):
+        """Read and decode a replay file"""
+        with open(path, 'rb') as replay_file:
+            data = replay_file.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        offset = len(MAGIC)
+        version, offset = read_varint(data, offset)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        seed, offset = read_varint(data, offset)
+        length, offset = read_varint(data, offset)
+        policy = data[offset:offset + length].decode()
+        offset += length
+        preview_size, offset = read_varint(data, offset)
+
+        records = []
+        clock = 0
+        while offset < len(data):
+            kind, offset = read_varint(data, offset)
+            delta, offset = read_varint(data, offset)
+            clock += delta
+            fields = []
+            for _ in range(cls.FIELD_COUNTS[kind]):
+                value, offset = read_varint(data, offset)
+                fields.append(value)
+            records.append((kind, clock, tuple(fields)))
+        return cls(seed, policy, preview_size, records)
+
+    def duration(self):
+        """Return the game time of the last record"""
+        return self.records[-1][1] if self.records else 0
+
+
+class ReplayPlayer:
+    def __init__(self, replay, snapshot_interval=REPLAY_SNAPSHOT_INTERVAL):
+        """Re-simulate a replay on a headless engine"""
+        self.replay = replay
+        self.snapshot_interval = snapshot_interval
+        self.listeners = []
+        self.position = 0
+        self.diverged = False
+
+        # Recorded locks, checked in order against the re-simulated ones
+        self.recorded_locks = [fields for kind, _, fields in replay.records if kind == LOCK]
+        self.locks = 0
+
+        self.engine = GameEngine(replay.seed, replay.policy, replay.preview_size)
+        self.engine.add_listener(self._on_event)
+        self.engine.start()
+
+        # Engine copies by snapshot number; snapshot k holds the state at k * interval
+        self.snapshots = {}
+        self._snapshot(0)
+
+    def add_listener(self, listener):
+        """Register a callback for the events of the re-simulated match"""
+        self.listeners.append(listener)
+
+    def _on_event(self, event, **data):
+        """Check locks against the recording, then pass the event on"""
+        if event == 'lock':
+            self._check_lock(data['player'], data['lines_cleared'])
+        for listener in self.listeners:
+            listener(event, **data)
+
+    def _check_lock(self, player, lines_cleared):
+        """Flag the replay as diverged when a lock differs from the recorded one"""
+        if self.locks == len(self.recorded_locks):
+            self.diverged = True
+            return
+        player_index, x, y, rotation, lines = self.recorded_locks[self.locks]
+        actual = (0 if player.is_human else 1, player.x, player.y, player.piece.rotation,
+                  lines_cleared)
+        if actual != (player_index, unzigzag(x), y, rotation, lines):
+            self.diverged = True
+        self.locks += 1
+
+    def _snapshot(self, number):
+        """Keep a copy of the engine, without its listeners"""
+        listeners = self.engine.listeners
+        self.engine.listeners = []
+        try:
+            self.snapshots[number] = (copy.deepcopy(self.engine), self.position, self.locks)
+        finally:
+            self.engine.listeners = listeners
+
+    def _restore(self, number):
+        """Continue from a snapshot, leaving the snapshot itself untouched"""
+        engine, self.position, self.locks = self.snapshots[number]
+        self.engine = copy.deepcopy(engine)
+        self.engine.listeners = [self._on_event]
+
+    def advance_to(self, ms):
+        """Re-simulate the match up to game time ms, taking snapshots along the way"""
+        records = self.replay.records
+        while True:
+            number = self.engine.clock // self.snapshot_interval + 1
+            snapshot_due = number * self.snapshot_interval
+            if self.position < len(records) and records[self.position][1] <= min(ms, snapshot_due):
+                self._apply(records[self.position])
+                self.position += 1
+            elif snapshot_due <= ms:
+                self.engine.set_time(snapshot_due)
+                if number not in self.snapshots:
+                    self._snapshot(number)
+            else:
+                break
+        self.engine.set_time(ms)
+
+    def _apply(self, record):
+        """Play a recorded input once every timer due by its time has run"""
+        kind, clock, fields = record
+        self.engine.set_time(clock)
+        if kind == INPUT:
+            player_index, move = fields
+            self.engine.input(self.engine.players()[player_index], MOVES[move])
+
+    def seek(self, ms):
+        """Jump to game time ms, restarting from the nearest earlier snapshot"""
+        ms = max(0, ms)
+        if ms < self.engine.clock:
+            number = max(n for n in self.snapshots if n * self.snapshot_interval <= ms)
+            self._restore(number)
+        self.advance_to(ms)
+
+    def run(self):
+        """Re-simulate the whole match as fast as possible"""
+        self.advance_to(self.replay.duration())
+        return self.engine
+
+
+class ReplayViewer:
+    def __init__(self, master, replay):
+        """Play a replay back in a Tk window"""
+        import tkinter as tk
+
+        self.master = master
+        self.player = ReplayPlayer(replay)
+        self.duration = replay.duration()
+        self.speed = 1.0
+        self.paused = False
+        self.last_time = time.perf_counter()
+
+        self.canvas = tk.Canvas(master, width=WINDOW_WIDTH, height=WINDOW_HEIGHT,
+                                bg=BACKGROUND_COLOR)
+        self.canvas.pack()
+        for board_x in (HUMAN_BOARD_X, AI_BOARD_X):
+            self.canvas.create_rectangle(
+                board_x - 2, BOARD_Y - 2,
+                board_x + BOARD_WIDTH * BLOCK_SIZE + 2, BOARD_Y + BOARD_HEIGHT * BLOCK_SIZE + 2,
+                outline=BORDER_COLOR, width=2
+            )
+        self.renderers = (
+            BoardRenderer(self.canvas, HUMAN_BOARD_X, BOARD_Y, "human_board"),
+            BoardRenderer(self.canvas, AI_BOARD_X, BOARD_Y, "ai_board")
+        )
+        self.info_text = self.canvas.create_text(
+            WINDOW_WIDTH // 2, 30, text="", font=("Arial", 14), fill=TEXT_COLOR
+        )
+        self.canvas.create_text(
+            WINDOW_WIDTH // 2, WINDOW_HEIGHT - 30,
+            text="Replay: Space Pause | ← → Seek | ↑ ↓ Speed",
+            font=("Arial", 10), fill=TEXT_COLOR
+        )
+
+        master.bind("<space>", self._toggle_pause)
+        master.bind("<Left>", lambda event: self._seek(-REPLAY_SEEK_STEP))
+        master.bind("<Right>", lambda event: self._seek(REPLAY_SEEK_STEP))
+        master.bind("<Up>", lambda event: self._set_speed(self.speed * 2))
+        master.bind("<Down>", lambda event: self._set_speed(self.speed / 2))
+        self._frame()
+
+    def _toggle_pause(self, event):
+        """Pause or resume the playback"""
+        self.paused = not self.paused
+
+    def _seek(self, delta):
+        """Jump forward or back by delta milliseconds of game time"""
+        self.player.seek(min(self.duration, self.player.engine.clock + delta))
+        self._draw()
+
+    def _set_speed(self, speed):
+        """Change the playback speed, between an eighth and 64 times real time"""
+        self.speed = min(64.0, max(0.125, speed))
+
+    def _frame(self):
+        """Advance the playback by the wall time since the last frame, then draw it"""
+        now = time.perf_counter()
+        elapsed = (now - self.last_time) * 1000 * self.speed
+        self.last_time = now
+        if not self.paused and self.player.engine.clock < self.duration:
+            self.player.advance_to(min(self.duration, self.player.engine.clock + int(elapsed)))
+        self._draw()
+        self.master.after(1000 // RENDER_FPS, self._frame)
+
+    def _draw(self):
+        """Draw both boards and the playback position"""
+        engine = self.player.engine
+        for player, renderer in zip(engine.players(), self.renderers):
+            color = PIECE_COLORS.get(player.shape, "#FFFFFF")
+            renderer.render(player.board, player.piece, player.x, player.y, color)
+        seconds = engine.clock // 1000
+        total = self.duration // 1000
+        self.canvas.itemconfig(
+            self.info_text,
+            text=(f"{seconds // 60:02}:{seconds % 60:02} / {total // 60:02}:{total % 60:02}"
+                  f"  x{self.speed:g}  Human {engine.get_score(engine.human)}"
+                  f" - AI {engine.get_score(engine.ai)}")
+        )
+
+
+def summarize(replay, player, duration):
+    """Return the outcome of a re-simulated replay as a dictionary"""
+    engine = player.engine
+    result = {
+        'seed': replay.seed,
+        'policy': replay.policy,
+        'game_time_ms': engine.clock,
+        'records': len(replay.records),
+        'diverged': player.diverged,
+        'duration': round(duration, 4)
+    }
+    for game_player in engine.players():
+        prefix = game_player.name.lower()
+        result[prefix + '_score'] = engine.get_score(game_player)
+        result[prefix + '_lines'] = game_player.lines_cleared
+        result[prefix + '_pieces'] = game_player.pieces_placed
+    return result
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the replay tool"""
+    parser = argparse.ArgumentParser(description="Re-simulate or watch a recorded match")
+    parser.add_argument("path", help="replay file to load")
+    parser.add_argument("--headless", action="store_true",
+                        help="re-simulate as fast as possible and print the outcome")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the replay tool from the command line"""
+    args = parse_args(argv)
+    replay = Replay.load(args.path)
+    if args.headless:
+        start = time.perf_counter()
+        player = ReplayPlayer(replay)
+        player.run()
+        print(json.dumps(summarize(replay, player, time.perf_counter() - start)))
+        return 1 if player.diverged else 0
+
+    import tkinter as tk
+    root = tk.Tk()
+    root.title("Tetris Replay")
+    ReplayViewer(root, replay)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Timing for the Tetris game.
+TimerQueue runs callbacks in order of a simulated clock; GameScheduler drives the
+engine from a single Tk timer with a fixed logic timestep and accumulated time,
+and renders at a capped frame rate.
+"""
+
+import heapq
+import time
+from constants import LOGIC_TIMESTEP, MAX_FRAME_TIME, FAST_FORWARD_TICKS, RENDER_FPS
+from instrumentation import metrics
+
+
+class TimerQueue:
+    def __init__(self):
+        """Initialize an empty priority queue of timers"""
+        self.heap = []
+        self.counter = 0
+        self.pending = set()
+        self.cancelled = set()
+
+    def __len__(self):
+        """Return the number of pending timers"""
+        return len(self.pending)
+
+    def schedule(self, due, callback, *args):
+        """
+        Schedule callback(*args) to run once the clock reaches due
+        Timers due at the same time run in the order they were scheduled
+        Returns an id that can be passed to cancel
+        """
+        timer_id = self.counter
+        self.counter += 1
+        heapq.heappush(self.heap, (due, timer_id, callback, args))
+        self.pending.add(timer_id)
+        return timer_id
+
+    def cancel(self, timer_id):
+        """Cancel a pending timer; unknown or already run ids are ignored"""
+        if timer_id in self.pending:
+            self.pending.discard(timer_id)
+            self.cancelled.add(timer_id)
+
+    def clear(self):
+        """Remove every pending timer"""
+        self.heap = []
+        self.pending = set()
+        self.cancelled = set()
+
+    def next_due(self):
+        """Return the time of the earliest pending timer, or None"""
+        self._drop_cancelled()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Remove and return the earliest (due, callback, args) timer due by now, or None"""
+        self._drop_cancelled()
+        if not self.heap or self.heap[0][0] > now:
+            return None
+        due, timer_id, callback, args = heapq.heappop(self.heap)
+        self.pending.discard(timer_id)
+        return due, callback, args
+
+    def _drop_cancelled(self):
+        """Discard cancelled timers from the front of the queue"""
+        heap = self.heap
+        while heap and heap[0][1] in self.cancelled:
+            self.cancelled.discard(heapq.heappop(heap)[1])
+
+
+class GameScheduler:
+    def __init__(self, master, engine, on_frame=None, timestep=LOGIC_TIMESTEP, fps=RENDER_FPS):
+        """Initialize a scheduler driving an engine from the Tk event loop"""
+        self.master = master
+        self.engine = engine
+        self.on_frame = on_frame
+        self.timestep = timestep
+        self.frame_interval = 1.0 / fps
+        self.last_frame = 0
+        self.running = False
+        self.paused = False
+        self.fast_forward = False
+        self.accumulator = 0
+        self.last_time = 0
+        self.tick_timer = None
+        self.pollers = []
+
+    def add_poller(self, callback):
+        """Call callback() before every logic tick, e.g. to collect results from other threads"""
+        self.pollers.append(callback)
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after delay milliseconds of game time"""
+        return self.engine.schedule(delay, callback, *args)
+
+    def cancel(self, timer_id):
+        """Cancel a timer created by schedule"""
+        self.engine.timers.cancel(timer_id)
+
+    def start(self):
+        """Start ticking; only one Tk timer is ever pending"""
+        self.stop()
+        self.running = True
+        self.paused = False
+        self.accumulator = 0
+        self.last_time = time.perf_counter()
+        self.tick_timer = self.master.after(self.timestep, self._tick)
+
+    def stop(self):
+        """Stop ticking and cancel the pending Tk timer"""
+        self.running = False
+        if self.tick_timer is not None:
+            self.master.after_cancel(self.tick_timer)
+            self.tick_timer = None
+
+    def pause(self):
+        """Freeze the game clock"""
+        self.paused = True
+
+    def resume(self):
+        """Unfreeze the game clock without catching up on the paused time"""
+        self.paused = False
+        self.accumulator = 0
+        self.last_time = time.perf_counter()
+
+    def set_fast_forward(self, enabled):
+        """Run many logic ticks per frame without rendering, or return to real time"""
+        self.fast_forward = enabled
+        self.accumulator = 0
+        self.last_time = time.perf_counter()
+        if not enabled and self.on_frame:
+            self.on_frame()
+
+    def run_logic(self, ms):
+        """Run the game logic for ms milliseconds of game time immediately, without rendering"""
+        ticks = int(ms // self.timestep)
+        for _ in range(ticks):
+            if self.engine.game_over:
+                break
+            for poller in self.pollers:
+                poller()
+            self.engine.advance(self.timestep)
+            metrics.count('engine.ticks')
+
+    def _tick(self):
+        """
+        Run the logic ticks owed since the last tick, then render if a frame is due
+        Any number of state changes between two frames are drawn in one frame
+        """
+        self.tick_timer = None
+        now = time.perf_counter()
+        elapsed = (now - self.last_time) * 1000
+        self.last_time = now
+
+        if not self.paused:
+            if self.fast_forward:
+                ticks = FAST_FORWARD_TICKS
+            else:
+                # Cap the catch-up after a stall so the game never spirals
+                self.accumulator += min(elapsed, MAX_FRAME_TIME)
+                ticks = int(self.accumulator // self.timestep)
+                self.accumulator -= ticks * self.timestep
+
+            self.run_logic(ticks * self.timestep)
+
+        if not self.fast_forward and now - self.last_frame >= self.frame_interval:
+            self.last_frame = now
+            if self.on_frame:
+                self.on_frame()
+
+        if self.running:
+            self.tick_timer = self.master.after(self.timestep, self._tick)
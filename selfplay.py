@@ -0,0 +1,178 @@
+"""
+Parallel self-play batch runner for the Tetris AI.
+Plays many headless games across all CPU cores and streams one JSON line per game.
+
+Usage: python -m selfplay --games 1000 --seed 42 --output results.jsonl [--telemetry events.db]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ai import TetrisAI
+from constants import PIECE_POLICY
+from engine import GameEngine
+from randomizer import POLICIES
+from movegen import trim_drop
+from telemetry import MatchTelemetry, TelemetryWriter
+
+# Game time simulated between checks of the piece limit in versus games
+VERSUS_STEP_MS = 1000
+
+
+def play_solo(seed, max_pieces, ai_options=None, policy=PIECE_POLICY, telemetry=None):
+    """
+    Play one game where the AI drops pieces on its own board as fast as it can
+    Events are recorded to the telemetry writer, if one is given
+    Returns the engine after the game ended or reached max_pieces
+    """
+    engine = GameEngine(seed, policy)
+    ai = TetrisAI(engine, seed=seed, **(ai_options or {}))
+    player = engine.ai
+    match = MatchTelemetry(engine, telemetry) if telemetry else None
+
+    engine.start()
+    while not engine.game_over and player.pieces_placed < max_pieces:
+        plan = ai.plan_move(
+            player.board, player.piece, player.x, player.y, engine.upcoming_shape(player)
+        )
+        if match:
+            match.ai_decision(player, ai.last_decision_time, ai.last_depth)
+        if plan is not None:
+            engine.apply_path(player, plan[3])
+        engine.hard_drop(player)
+        engine.step(player)
+    return engine
+
+
+def play_versus(seed, max_pieces, ai_options=None, policy=PIECE_POLICY, telemetry=None):
+    """
+    Play one match where the TetrisAI controls both boards under normal gravity
+    Events are recorded to the telemetry writer, if one is given
+    Returns the engine after the match ended or a player reached max_pieces
+    """
+    engine = GameEngine(seed, policy)
+    ais = {
+        engine.human: TetrisAI(engine, seed=f"{seed}-human", **(ai_options or {})),
+        engine.ai: TetrisAI(engine, seed=f"{seed}-ai", **(ai_options or {}))
+    }
+    match = MatchTelemetry(engine, telemetry) if telemetry else None
+
+    def on_event(event, player=None, **data):
+        """Steer every newly spawned piece to the placement chosen by its AI"""
+        if event == 'spawn':
+            ai = ais[player]
+            plan = ai.plan_move(
+                player.board, player.piece, player.x, player.y, engine.upcoming_shape(player)
+            )
+            if match:
+                match.ai_decision(player, ai.last_decision_time, ai.last_depth)
+            if plan is not None:
+                # Gravity does the rest of the fall
+                engine.apply_path(player, trim_drop(plan[3]))
+
+    engine.add_listener(on_event)
+    engine.start()
+    while not engine.game_over and max(p.pieces_placed for p in engine.players()) < max_pieces:
+        engine.advance(VERSUS_STEP_MS)
+    return engine
+
+
+def run_game(game_index, seed, mode, max_pieces, ai_options=None, policy=PIECE_POLICY,
+             telemetry_path=None):
+    """
+    Play a single game and return its result as a dictionary
+    With telemetry_path set, the game's events are appended to that file
+    """
+    telemetry = TelemetryWriter(telemetry_path) if telemetry_path else None
+    start = time.perf_counter()
+    try:
+        if mode == 'solo':
+            engine = play_solo(seed, max_pieces, ai_options, policy, telemetry)
+            players = (engine.ai,)
+        else:
+            engine = play_versus(seed, max_pieces, ai_options, policy, telemetry)
+            players = engine.players()
+        duration = time.perf_counter() - start
+    finally:
+        if telemetry:
+            telemetry.close()
+
+    result = {
+        'game': game_index,
+        'seed': seed,
+        'mode': mode,
+        'policy': policy,
+        'duration': round(duration, 4),
+        'topped_out': engine.game_over
+    }
+    if mode != 'solo':
+        # Solo games drop pieces without gravity, so their game clock never moves
+        result['game_time_ms'] = engine.clock
+    for player in players:
+        prefix = player.name.lower()
+        result[prefix + '_score'] = engine.get_score(player)
+        result[prefix + '_lines'] = player.lines_cleared
+        result[prefix + '_pieces'] = player.pieces_placed
+    return result
+
+
+def run_batch(games, base_seed, mode, max_pieces, workers=None, ai_options=None,
+              policy=PIECE_POLICY, telemetry_path=None):
+    """
+    Play games in a process pool, yielding each result as soon as it finishes
+    Game i uses the seed base_seed + i, so every game can be replayed on its own
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                run_game, index, base_seed + index, mode, max_pieces, ai_options, policy,
+                telemetry_path
+            )
+            for index in range(games)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the batch runner"""
+    parser = argparse.ArgumentParser(description="Run headless AI self-play games in parallel")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--mode", choices=("solo", "versus"), default="solo",
+                        help="AI alone on one board, or AI against AI")
+    parser.add_argument("--max-pieces", type=int, default=1000,
+                        help="stop a game once a player has placed this many pieces")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--depth", type=int, default=None, help="AI search depth")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default=PIECE_POLICY,
+                        help="how pieces are dealt")
+    parser.add_argument("--output", default="-", help="JSONL file to write, '-' for stdout")
+    parser.add_argument("--telemetry", default=None,
+                        help="also record every game's events to this JSONL or .db SQLite file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the batch and stream the per-game results as JSON lines"""
+    args = parse_args(argv)
+    ai_options = {'depth': args.depth} if args.depth else None
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in run_batch(args.games, args.seed, args.mode, args.max_pieces,
+                                args.workers, ai_options, args.policy, args.telemetry):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
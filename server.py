@@ -0,0 +1,630 @@
+"""
+Asyncio match server hosting many headless Tetris matches in one process.
+Clients speak JSON lines over TCP or a Unix socket: join a match against the
+AI, send inputs, request snapshots and spectate. Every match ticks on the
+event loop, the AI thinks in an executor, and state changes go out as diffs,
+either as JSON or as the binary frames of snapshot.py.
+
+Usage: python -m server [--host 127.0.0.1 --port 7878 | --unix /tmp/tetris.sock] [--loopback 100]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from ai import TetrisAI, load_weights, time_budget
+from constants import (
+    AI_WEIGHTS_FILE, PIECE_POLICY, SERVER_HOST, SERVER_PORT, SERVER_TICK,
+    SERVER_AI_WORKERS, SERVER_AI_DEPTH, SERVER_AI_CACHE_SIZE, SERVER_AI_CACHE_MEMORY,
+    SERVER_SEND_QUEUE
+)
+from engine import GameEngine
+from movegen import LEFT, RIGHT, ROTATE, DOWN, DROP, find_path, trim_drop
+from randomizer import POLICIES
+from snapshot import SnapshotEncoder, SnapshotDecoder, ResyncRequired, board_state
+
+MOVES = (LEFT, RIGHT, ROTATE, DOWN, DROP)
+
+# Ways a spectator can receive a match
+ENCODINGS = ('json', 'delta')
+
+
+class CommandError(Exception):
+    """Raised for a command the server cannot carry out; reported to the client"""
+
+
+def player_state(engine, player):
+    """Return the visible state of one board as a JSON-friendly dictionary"""
+    piece = None
+    if player.piece is not None:
+        piece = [player.shape, player.piece.rotation, player.x, player.y]
+    return {
+        'rows': list(player.board.rows),
+        'piece': piece,
+        'preview': list(engine.preview(player)),
+        'score': engine.get_score(player),
+        'lines': player.lines_cleared,
+        'pieces': player.pieces_placed,
+        'slowed': player.is_slowed
+    }
+
+
+def state_diff(old, new):
+    """
+    Return the fields of a board state that changed
+    Rows are sent as {row index: mask} for the changed rows only
+    """
+    diff = {}
+    for key, value in new.items():
+        if key == 'rows':
+            rows = {str(row): mask for row, (before, mask) in enumerate(zip(old['rows'], value))
+                    if before != mask}
+            if rows:
+                diff['rows'] = rows
+        elif old[key] != value:
+            diff[key] = value
+    return diff
+
+
+def apply_diff(state, diff):
+    """Update a board state received earlier with a diff, in place"""
+    for key, value in diff.items():
+        if key == 'rows':
+            for row, mask in value.items():
+                state['rows'][int(row)] = mask
+        else:
+            state[key] = value
+    return state
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        """
+        Wrap a client stream with a bounded outbox drained by its own task
+        A slow client never stalls a match: once its outbox is full, messages
+        are dropped and the client is sent a fresh snapshot when it catches up
+        """
+        self.reader = reader
+        self.writer = writer
+        self.outbox = asyncio.Queue(SERVER_SEND_QUEUE)
+        self.match = None
+        self.watching = set()
+        self.delta = set()
+        self.stale = set()
+        self.sender = asyncio.ensure_future(self._send_loop())
+
+    def send(self, message):
+        """Queue a message; returns False if it was dropped because the outbox is full"""
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def close(self):
+        """Flush the queued messages and close the stream"""
+        try:
+            self.outbox.put_nowait(None)
+        except asyncio.QueueFull:
+            self.sender.cancel()
+        try:
+            await self.sender
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        self.writer.close()
+
+    async def _send_loop(self):
+        """Write queued messages as JSON lines until closed"""
+        while True:
+            message = await self.outbox.get()
+            if message is None:
+                return
+            self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b"\n")
+            await self.writer.drain()
+
+
+class Match:
+    def __init__(self, match_id, executor, seed=None, policy=PIECE_POLICY, ai_depth=SERVER_AI_DEPTH):
+        """Set up a match between a remote player on the human board and the AI"""
+        self.id = match_id
+        self.executor = executor
+        self.engine = GameEngine(seed, policy)
+        self.engine.add_listener(self._on_event)
+        # Hundreds of matches share the process, so each AI gets a small cache
+        self.ai = TetrisAI(
+            self.engine, depth=ai_depth, evaluation_cache_size=SERVER_AI_CACHE_SIZE,
+            evaluation_cache_memory=SERVER_AI_CACHE_MEMORY,
+            weights=load_weights(AI_WEIGHTS_FILE), seed=seed
+        )
+        self.player = None
+        self.spectators = set()
+        self.states = None
+        self.encoders = {
+            player.name: SnapshotEncoder(player.board.width) for player in self.engine.players()
+        }
+        self.task = None
+        self.closed = False
+
+        # Only one decision runs at a time, since the AI's caches are not shared safely
+        self.ai_busy = False
+
+    def start(self):
+        """Start the match and its tick task on the running event loop"""
+        self.engine.start()
+        self.states = self._states()
+        self._encode_frames()
+        self.task = asyncio.ensure_future(self._run())
+        return self.task
+
+    def close(self):
+        """Stop the match early and tell the spectators"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.task:
+            self.task.cancel()
+        self._send_all({'type': 'closed', 'match': self.id})
+
+    def snapshot(self):
+        """Return the full state of the match"""
+        return {
+            'type': 'snapshot',
+            'match': self.id,
+            'clock': self.engine.clock,
+            'seed': self.engine.game_seed,
+            'game_over': self.engine.game_over,
+            'players': self._states()
+        }
+
+    def keyframes(self):
+        """Return full frames of both boards, as last broadcast, for delta spectators"""
+        return self._frames_message(
+            {name: encoder.keyframe() for name, encoder in self.encoders.items()}
+        )
+
+    def play(self, move):
+        """Play one input of the remote player"""
+        if move not in MOVES:
+            raise CommandError(f"unknown move: {move}")
+        if not self.engine.game_over:
+            self.engine.input(self.engine.human, move)
+
+    async def _run(self):
+        """Advance the game clock with the loop's clock and broadcast the changes of every tick"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while not self.engine.game_over:
+            await asyncio.sleep(SERVER_TICK / 1000)
+            self.engine.set_time(int((loop.time() - start) * 1000))
+            self._broadcast()
+        self.closed = True
+        winner = self.engine.winner()
+        self._send_all({
+            'type': 'game_over',
+            'match': self.id,
+            'clock': self.engine.clock,
+            'winner': winner.name if winner else None,
+            'players': self._states()
+        })
+
+    def _states(self):
+        """Return the state of both boards by player name"""
+        return {player.name: player_state(self.engine, player) for player in self.engine.players()}
+
+    def _encode_frames(self):
+        """Encode the changes of each board since the last tick as snapshot frames"""
+        frames = {}
+        for player in self.engine.players():
+            frame = self.encoders[player.name].encode(board_state(self.engine, player))
+            if frame is not None:
+                frames[player.name] = frame
+        return frames
+
+    def _frames_message(self, frames):
+        """Wrap snapshot frames, by player name, into a message"""
+        return {
+            'type': 'frames',
+            'match': self.id,
+            'clock': self.engine.clock,
+            'players': {name: base64.b64encode(frame).decode() for name, frame in frames.items()}
+        }
+
+    def _watchers(self):
+        """Return every connection following the match"""
+        if self.player is None:
+            return list(self.spectators)
+        return [self.player] + [c for c in self.spectators if c is not self.player]
+
+    def _broadcast(self):
+        """
+        Send what changed since the last tick, as JSON diffs or snapshot frames
+        Clients that fell behind get a snapshot or keyframes instead
+        """
+        states = self._states()
+        changes = {}
+        for name, state in states.items():
+            diff = state_diff(self.states[name], state)
+            if diff:
+                changes[name] = diff
+        self.states = states
+        diff_message = None
+        if changes:
+            diff_message = {'type': 'diff', 'match': self.id, 'clock': self.engine.clock, 'players': changes}
+        frames = self._encode_frames()
+        frames_message = self._frames_message(frames) if frames else None
+
+        for connection in self._watchers():
+            delta = self.id in connection.delta
+            if self.id in connection.stale:
+                if connection.send(self.keyframes() if delta else self.snapshot()):
+                    connection.stale.discard(self.id)
+                continue
+            message = frames_message if delta else diff_message
+            if message and not connection.send(message):
+                connection.stale.add(self.id)
+
+    def _send_all(self, message):
+        """Send a message to every watcher, ignoring full outboxes"""
+        for connection in self._watchers():
+            connection.send(message)
+
+    def _on_event(self, event, player=None, **data):
+        """Ask the AI for a move whenever it gets a new piece"""
+        if event == 'spawn' and player is self.engine.ai:
+            self._request_ai_move()
+
+    def _request_ai_move(self):
+        """Run a decision for the AI's current piece in the executor"""
+        if self.ai_busy or self.closed or self.engine.game_over:
+            return
+        player = self.engine.ai
+        self.ai_busy = True
+        token = player.pieces_placed
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self.ai.plan_move, player.board.copy(), player.piece,
+            player.x, player.y, self.engine.upcoming_shape(player), time_budget(player.fall_speed)
+        )
+        future.add_done_callback(lambda done: self._ai_move_done(done, token))
+
+    def _ai_move_done(self, future, token):
+        """
+        Steer the AI piece to the chosen placement, on the event loop
+        If the piece locked while the AI was thinking, decide again for the new one;
+        if the search failed, the error is logged and the match ends
+        """
+        self.ai_busy = False
+        if self.closed or future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Match {self.id}: AI decision failed", file=sys.stderr)
+            traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+            self._send_all({'type': 'error', 'match': self.id, 'error': "AI decision failed"})
+            self.close()
+            return
+        plan = future.result()
+        player = self.engine.ai
+        if player.pieces_placed != token:
+            self._request_ai_move()
+            return
+        if plan is None:
+            return
+        target_piece, target_x, target_y, path = plan
+        if player.y != 0 or player.x != player.piece.spawn_x or player.piece.rotation != 0:
+            path = find_path(
+                player.board, player.piece, player.x, player.y, target_piece, target_x, target_y
+            )
+            if path is None:
+                return
+        self.engine.apply_path(player, trim_drop(path))
+
+
+class MatchServer:
+    def __init__(self, ai_workers=SERVER_AI_WORKERS, ai_depth=SERVER_AI_DEPTH):
+        """Initialize a server with no matches and a shared executor for AI decisions"""
+        self.executor = ThreadPoolExecutor(ai_workers, thread_name_prefix="ai")
+        self.ai_depth = ai_depth
+        self.matches = {}
+        self.next_id = 1
+        self.commands = {
+            'join': self._join,
+            'input': self._input,
+            'snapshot': self._snapshot,
+            'spectate': self._spectate,
+            'resync': self._resync,
+            'list': self._list
+        }
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """Listen on a Unix socket if a path is given, on TCP otherwise"""
+        if path:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        """Stop every match and the AI executor"""
+        for match in list(self.matches.values()):
+            match.close()
+        self.executor.shutdown(wait=False)
+
+    async def handle(self, reader, writer):
+        """Serve one client: read commands until it disconnects"""
+        connection = Connection(reader, writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    command = json.loads(line)
+                    handler = self.commands.get(command.get('cmd'))
+                    if handler is None:
+                        raise CommandError(f"unknown command: {command.get('cmd')}")
+                    handler(connection, command)
+                except (CommandError, ValueError, AttributeError, TypeError, KeyError) as error:
+                    connection.send({'type': 'error', 'error': str(error)})
+        except ConnectionError:
+            pass
+        finally:
+            self._disconnect(connection)
+            await connection.close()
+
+    def _match(self, connection, command):
+        """Return the match named by a command, or the connection's own match"""
+        match_id = command.get('match')
+        if match_id is not None and (not isinstance(match_id, int) or isinstance(match_id, bool)):
+            raise CommandError(f"match must be an integer: {match_id}")
+        match = self.matches.get(match_id) if match_id is not None else connection.match
+        if match is None:
+            raise CommandError(f"no such match: {match_id}")
+        return match
+
+    def _join(self, connection, command):
+        """Start a new match with the client on the human board"""
+        if connection.match is not None:
+            raise CommandError("already playing a match")
+        policy = command.get('policy', PIECE_POLICY)
+        if not isinstance(policy, str) or policy not in POLICIES:
+            raise CommandError(f"unknown policy: {policy}")
+        seed = command.get('seed')
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            raise CommandError(f"seed must be an integer: {seed}")
+        match = Match(self.next_id, self.executor, seed, policy, self.ai_depth)
+        self.next_id += 1
+        match.player = connection
+        connection.match = match
+        self.matches[match.id] = match
+        match.start().add_done_callback(lambda _: self.matches.pop(match.id, None))
+        connection.send({'type': 'joined', 'match': match.id, 'player': match.engine.human.name})
+        connection.send(match.snapshot())
+
+    def _input(self, connection, command):
+        """Play an input for the client's match"""
+        if connection.match is None or connection.match.closed:
+            raise CommandError("not playing a match")
+        connection.match.play(command.get('move'))
+
+    def _snapshot(self, connection, command):
+        """Send the full state of a match"""
+        connection.send(self._match(connection, command).snapshot())
+
+    def _spectate(self, connection, command):
+        """
+        Follow the changes of a match, as JSON diffs after a snapshot, or with
+        encoding 'delta' as snapshot frames after keyframes
+        """
+        match = self._match(connection, command)
+        encoding = command.get('encoding', 'json')
+        if encoding not in ENCODINGS:
+            raise CommandError(f"unknown encoding: {encoding}")
+        match.spectators.add(connection)
+        connection.watching.add(match)
+        if encoding == 'delta':
+            connection.delta.add(match.id)
+            connection.send(match.keyframes())
+        else:
+            connection.delta.discard(match.id)
+            connection.send(match.snapshot())
+
+    def _resync(self, connection, command):
+        """Send a fresh snapshot or keyframes of a match with the next tick"""
+        connection.stale.add(self._match(connection, command).id)
+
+    def _list(self, connection, command):
+        """Send the ids, clocks and scores of the running matches"""
+        connection.send({
+            'type': 'matches',
+            'matches': [
+                {
+                    'match': match.id,
+                    'clock': match.engine.clock,
+                    'scores': {p.name: match.engine.get_score(p) for p in match.engine.players()}
+                }
+                for match in self.matches.values()
+            ]
+        })
+
+    def _disconnect(self, connection):
+        """End the client's match and stop its spectating"""
+        for match in connection.watching:
+            match.spectators.discard(connection)
+        if connection.match is not None:
+            connection.match.player = None
+            connection.match.close()
+            connection.match = None
+
+
+class MatchClient:
+    def __init__(self, reader, writer):
+        """JSON-lines client of the match server, for bots and loopback tests"""
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """Connect over a Unix socket if a path is given, over TCP otherwise"""
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, cmd, **fields):
+        """Send a command"""
+        self.writer.write(json.dumps(dict(fields, cmd=cmd)).encode() + b"\n")
+        await self.writer.drain()
+
+    async def receive(self):
+        """Return the next message, or None once the server closed the connection"""
+        line = await self.reader.readline()
+        return json.loads(line) if line else None
+
+    async def close(self):
+        """Close the connection"""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _frame_state(state):
+    """Convert a JSON board state to the tuple rebuilt from snapshot frames"""
+    shape, rotation, x, y = state['piece'] or (None, 0, 0, 0)
+    return (tuple(state['rows']), shape, rotation, x, y, state['score'], state['lines'])
+
+
+async def _loopback_spectator(host, port, match_id):
+    """
+    Watch a match through snapshot frames
+    Returns whether the boards rebuilt from the frames match the final state, and
+    the bytes received
+    """
+    client = await MatchClient.connect(host, port)
+    await client.send('spectate', match=match_id, encoding='delta')
+    decoders = {}
+    received = 0
+    while True:
+        line = await client.reader.readline()
+        if not line:
+            return False, received
+        received += len(line)
+        message = json.loads(line)
+        if message['type'] == 'frames':
+            try:
+                for player, frame in message['players'].items():
+                    decoders.setdefault(player, SnapshotDecoder()).apply(base64.b64decode(frame))
+            except ResyncRequired:
+                await client.send('resync', match=match_id)
+        elif message['type'] in ('game_over', 'closed'):
+            await client.close()
+            final = {player: _frame_state(state) for player, state in message.get('players', {}).items()}
+            return final == {player: d.state for player, d in decoders.items()}, received
+
+
+async def _loopback_bot(host, port, seed):
+    """
+    Play one match as a bot that moves each new piece randomly and drops it
+    Follows the diffs and checks them against the final state sent at game over;
+    a spectator checks the snapshot frames of the same match
+    """
+    client = await MatchClient.connect(host, port)
+    rng = random.Random(seed)
+    await client.send('join', seed=seed)
+    joined = await client.receive()
+    states = (await client.receive())['players']
+    spectator = asyncio.ensure_future(_loopback_spectator(host, port, joined['match']))
+    name = joined['player']
+    messages = 2
+    pieces = 0
+    while True:
+        message = await client.receive()
+        if message is None:
+            break
+        messages += 1
+        if message['type'] == 'diff':
+            for player, diff in message['players'].items():
+                apply_diff(states[player], diff)
+        elif message['type'] == 'snapshot':
+            states = message['players']
+        elif message['type'] == 'game_over':
+            await client.close()
+            frames_in_sync, frame_bytes = await spectator
+            return {
+                'match': joined['match'],
+                'seed': seed,
+                'clock': message['clock'],
+                'winner': message['winner'],
+                'scores': {player: state['score'] for player, state in message['players'].items()},
+                'messages': messages,
+                'in_sync': states == message['players'] and frames_in_sync,
+                'frame_bytes': frame_bytes
+            }
+        if states[name]['pieces'] > pieces:
+            pieces = states[name]['pieces']
+            moves = [rng.choice((LEFT, RIGHT, ROTATE)) for _ in range(rng.randint(0, 5))]
+            for move in moves + [DROP]:
+                await client.send('input', move=move)
+    await client.close()
+    return None
+
+
+async def run_loopback(matches, ai_workers=SERVER_AI_WORKERS):
+    """Serve matches played by loopback bots on an ephemeral port and return their results"""
+    server = MatchServer(ai_workers)
+    listener = await server.start(SERVER_HOST, 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        return await asyncio.gather(*(_loopback_bot(SERVER_HOST, port, seed) for seed in range(matches)))
+    finally:
+        listener.close()
+        server.close()
+
+
+async def serve(host, port, path, ai_workers):
+    """Run the server until interrupted"""
+    server = MatchServer(ai_workers)
+    listener = await server.start(host, port, path)
+    print(f"Serving matches on {path or f'{host}:{port}'}", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the match server"""
+    parser = argparse.ArgumentParser(description="Host headless Tetris matches over JSON lines")
+    parser.add_argument("--host", default=SERVER_HOST, help="TCP address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="TCP port to listen on")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--ai-workers", type=int, default=SERVER_AI_WORKERS,
+                        help="threads running AI decisions")
+    parser.add_argument("--loopback", type=int, default=None, metavar="MATCHES",
+                        help="play this many matches with local bots, print the results and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the server, or a loopback test, from the command line"""
+    args = parse_args(argv)
+    if args.loopback:
+        start = time.perf_counter()
+        results = asyncio.run(run_loopback(args.loopback, args.ai_workers))
+        for result in results:
+            print(json.dumps(result))
+        print(f"{len(results)} matches in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        return 0 if all(result and result['in_sync'] for result in results) else 1
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.ai_workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
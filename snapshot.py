@@ -0,0 +1,220 @@
+"""
+Delta-encoded board state frames for spectators and network clients.
+A full frame packs every row into bytes together with the falling piece and
+score; later frames carry only the changed rows and fields. Every frame is
+versioned and numbered, so a decoder that misses one asks for a resync.
+"""
+
+import io
+
+from replay import SHAPE_NAMES, write_varint, read_varint, zigzag, unzigzag
+
+FORMAT_VERSION = 1
+
+# Frame types
+FULL = 1
+DELTA = 2
+
+# Fields present in a delta frame
+PIECE_CHANGED = 1
+SCORE_CHANGED = 2
+LINES_CHANGED = 4
+
+
+class ResyncRequired(Exception):
+    """Raised by a decoder given a delta that does not follow the last frame it applied"""
+
+
+def board_state(engine, player):
+    """
+    Return the state sent for one board as a tuple
+    (rows, shape, rotation, x, y, score, lines); shape is None between pieces
+    """
+    piece = player.piece
+    return (
+        tuple(player.board.rows),
+        player.shape if piece else None,
+        piece.rotation if piece else 0,
+        player.x,
+        player.y,
+        engine.get_score(player),
+        player.lines_cleared
+    )
+
+
+def _row_bytes(width):
+    """Return the bytes needed to pack one row of a board width"""
+    return (width + 7) // 8
+
+
+def _write_piece(output, state):
+    """Write the shape, rotation and position of the falling piece"""
+    _, shape, rotation, x, y, _, _ = state
+    if shape is None:
+        write_varint(output, 0)
+        return
+    write_varint(output, SHAPE_NAMES.index(shape) + 1)
+    write_varint(output, rotation)
+    write_varint(output, zigzag(x))
+    write_varint(output, zigzag(y))
+
+
+def _read_piece(data, offset):
+    """Read a piece written by _write_piece; returns ((shape, rotation, x, y), next offset)"""
+    shape, offset = read_varint(data, offset)
+    if not shape:
+        return (None, 0, 0, 0), offset
+    rotation, offset = read_varint(data, offset)
+    x, offset = read_varint(data, offset)
+    y, offset = read_varint(data, offset)
+    return (SHAPE_NAMES[shape - 1], rotation, unzigzag(x), unzigzag(y)), offset
+
+
+def encode_full(state, sequence, width):
+    """Encode a complete board state as frame number sequence"""
+    output = io.BytesIO()
+    output.write(bytes((FORMAT_VERSION, FULL)))
+    write_varint(output, sequence)
+    rows = state[0]
+    write_varint(output, width)
+    write_varint(output, len(rows))
+    row_bytes = _row_bytes(width)
+    for mask in rows:
+        output.write(mask.to_bytes(row_bytes, 'little'))
+    _write_piece(output, state)
+    write_varint(output, state[5])
+    write_varint(output, state[6])
+    return output.getvalue()
+
+
+def encode_delta(old, new, sequence, width):
+    """
+    Encode the changes from old to new as frame number sequence
+    Changed rows are listed by a bitmap of their indices
+    """
+    output = io.BytesIO()
+    output.write(bytes((FORMAT_VERSION, DELTA)))
+    write_varint(output, sequence)
+
+    changed = 0
+    for row, (before, after) in enumerate(zip(old[0], new[0])):
+        if before != after:
+            changed |= 1 << row
+    write_varint(output, changed)
+    row_bytes = _row_bytes(width)
+    for row, mask in enumerate(new[0]):
+        if changed >> row & 1:
+            output.write(mask.to_bytes(row_bytes, 'little'))
+
+    flags = 0
+    if old[1:5] != new[1:5]:
+        flags |= PIECE_CHANGED
+    if old[5] != new[5]:
+        flags |= SCORE_CHANGED
+    if old[6] != new[6]:
+        flags |= LINES_CHANGED
+    output.write(bytes((flags,)))
+    if flags & PIECE_CHANGED:
+        _write_piece(output, new)
+    if flags & SCORE_CHANGED:
+        write_varint(output, new[5])
+    if flags & LINES_CHANGED:
+        write_varint(output, new[6])
+    return output.getvalue()
+
+
+class SnapshotEncoder:
+    def __init__(self, width):
+        """Encode the successive states of one board of the given width"""
+        self.width = width
+        self.sequence = 0
+        self.state = None
+
+    def encode(self, state):
+        """
+        Return the frame taking a decoder from the last encoded state to state
+        The first frame is a full one; returns None if nothing changed
+        """
+        if state == self.state:
+            return None
+        self.sequence += 1
+        if self.state is None:
+            frame = encode_full(state, self.sequence, self.width)
+        else:
+            frame = encode_delta(self.state, state, self.sequence, self.width)
+        self.state = state
+        return frame
+
+    def keyframe(self):
+        """
+        Return a full frame of the last encoded state, numbered like it
+        Deltas encoded afterwards apply on top of it, which is how a client resyncs
+        """
+        if self.state is None:
+            return None
+        return encode_full(self.state, self.sequence, self.width)
+
+
+class SnapshotDecoder:
+    def __init__(self):
+        """Rebuild the state of one board from its frames"""
+        self.width = None
+        self.sequence = None
+        self.state = None
+
+    def apply(self, frame):
+        """
+        Apply a frame and return the new state
+        Raises ResyncRequired if a delta does not follow the last applied frame;
+        the decoder then ignores deltas until the next full frame
+        """
+        version, kind = frame[0], frame[1]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        sequence, offset = read_varint(frame, 2)
+        if kind == FULL:
+            self.state = self._read_full(frame, offset)
+        elif kind == DELTA:
+            if self.state is None or sequence != self.sequence + 1:
+                raise ResyncRequired(f"Frame {sequence} does not follow frame {self.sequence}")
+            self.state = self._read_delta(frame, offset)
+        else:
+            raise ValueError(f"Unknown snapshot frame type: {kind}")
+        self.sequence = sequence
+        return self.state
+
+    def _read_full(self, frame, offset):
+        """Read the body of a full frame"""
+        self.width, offset = read_varint(frame, offset)
+        height, offset = read_varint(frame, offset)
+        row_bytes = _row_bytes(self.width)
+        rows = []
+        for _ in range(height):
+            rows.append(int.from_bytes(frame[offset:offset + row_bytes], 'little'))
+            offset += row_bytes
+        piece, offset = _read_piece(frame, offset)
+        score, offset = read_varint(frame, offset)
+        lines, offset = read_varint(frame, offset)
+        return (tuple(rows),) + piece + (score, lines)
+
+    def _read_delta(self, frame, offset):
+        """Read the body of a delta frame on top of the current state"""
+        rows, shape, rotation, x, y, score, lines = self.state
+        changed, offset = read_varint(frame, offset)
+        if changed:
+            rows = list(rows)
+            row_bytes = _row_bytes(self.width)
+            for row in range(len(rows)):
+                if changed >> row & 1:
+                    rows[row] = int.from_bytes(frame[offset:offset + row_bytes], 'little')
+                    offset += row_bytes
+            rows = tuple(rows)
+        flags = frame[offset]
+        offset += 1
+        if flags & PIECE_CHANGED:
+            (shape, rotation, x, y), offset = _read_piece(frame, offset)
+        if flags & SCORE_CHANGED:
+            score, offset = read_varint(frame, offset)
+        if flags & LINES_CHANGED:
+            lines, offset = read_varint(frame, offset)
+        return rows, shape, rotation, x, y, score, lines
@@ -0,0 +1,186 @@
+"""
+Match telemetry for the Tetris game.
+Turns engine events (locks, gifts, slowdowns, special pieces, game over) and AI
+decision times into records, buffers them in a bounded ring buffer and writes
+them in batches to JSONL or SQLite from a background thread.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from constants import TELEMETRY_BUFFER_SIZE, TELEMETRY_BATCH_SIZE, TELEMETRY_FLUSH_INTERVAL
+
+
+class JsonlSink:
+    def __init__(self, path):
+        """Append records to a JSON lines file"""
+        self.output = open(path, 'a')
+
+    def write(self, records):
+        """Write a batch of records in one call"""
+        self.output.write("".join(json.dumps(record) + "\n" for record in records))
+        self.output.flush()
+
+    def close(self):
+        """Close the file"""
+        self.output.close()
+
+
+class SqliteSink:
+    def __init__(self, path):
+        """Append records to an events table of a SQLite database"""
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "match TEXT, game_time INTEGER, event TEXT, player TEXT, data TEXT)"
+        )
+        self.connection.commit()
+
+    def write(self, records):
+        """Insert a batch of records in one transaction"""
+        rows = []
+        for record in records:
+            record = dict(record)
+            rows.append((
+                record.pop('match'), record.pop('time'), record.pop('event'),
+                record.pop('player', None), json.dumps(record)
+            ))
+        with self.connection:
+            self.connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        """Close the database"""
+        self.connection.close()
+
+
+def open_sink(path):
+    """Open a SQLite sink for .db/.sqlite paths and a JSONL sink otherwise"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteSink(path)
+    return JsonlSink(path)
+
+
+class TelemetryWriter:
+    def __init__(self, path, capacity=TELEMETRY_BUFFER_SIZE, batch_size=TELEMETRY_BATCH_SIZE,
+                 flush_interval=TELEMETRY_FLUSH_INTERVAL):
+        """
+        Start a background thread writing buffered records to path
+        The buffer holds at most capacity records; when the writer falls behind
+        the oldest records are dropped and counted, so record never blocks
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.flush_requested = False
+        self.dropped = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, record):
+        """Queue a record for writing"""
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(record)
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def flush(self):
+        """Ask the thread to write the buffered records now, without waiting for it"""
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify()
+
+    def close(self):
+        """Write the remaining records and stop the thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _run(self):
+        """Write a batch whenever one is full or flush_interval has passed"""
+        # The sink is opened here, since SQLite connections belong to one thread
+        sink = open_sink(self.path)
+        try:
+            while True:
+                with self.condition:
+                    if not (self.closed or self.flush_requested) and len(self.buffer) < self.batch_size:
+                        self.condition.wait(self.flush_interval)
+                    batch = list(self.buffer)
+                    self.buffer.clear()
+                    self.flush_requested = False
+                    closed = self.closed
+                if batch:
+                    sink.write(batch)
+                    self.written += len(batch)
+                if closed:
+                    break
+        finally:
+            sink.close()
+
+
+class MatchTelemetry:
+    def __init__(self, engine, writer):
+        """Record the events of every match the engine plays"""
+        self.engine = engine
+        self.writer = writer
+        self.match_id = None
+        engine.add_listener(self._on_event)
+
+    def _on_event(self, event, player=None, **data):
+        """Turn a game event into a telemetry record"""
+        engine = self.engine
+        if event == 'start':
+            self.match_id = uuid.uuid4().hex
+            self._record('match_start', seed=engine.game_seed, policy=engine.policy)
+        elif event == 'lock':
+            self._record(
+                'lock', player,
+                lines=data['lines_cleared'],
+                rows=list(data['rows']),
+                points=data['points'],
+                score=engine.get_score(player),
+                pieces=player.pieces_placed
+            )
+        elif event == 'gift':
+            self._record('gift', player, shape=data['shape'])
+        elif event == 'slowdown_start':
+            self._record(
+                'slowdown_start',
+                fall_speeds={p.name: p.fall_speed for p in engine.players()}
+            )
+        elif event == 'slowdown_end':
+            self._record('slowdown_end', player, fall_speed=player.fall_speed)
+        elif event == 'special_piece':
+            self._record('special_piece', player)
+        elif event == 'game_over':
+            winner = engine.winner()
+            self._record(
+                'game_over', player,
+                winner=winner.name if winner else None,
+                scores={p.name: engine.get_score(p) for p in engine.players()},
+                lines={p.name: p.lines_cleared for p in engine.players()},
+                pieces={p.name: p.pieces_placed for p in engine.players()}
+            )
+
+    def ai_decision(self, player, seconds, depth):
+        """Record how long an AI took to choose a move and how deep it searched"""
+        self._record('ai_decision', player, ms=round(seconds * 1000, 3), depth=depth)
+
+    def _record(self, event, player=None, **fields):
+        """Queue a record stamped with the match and the game time"""
+        record = {
+            'match': self.match_id,
+            'time': self.engine.clock,
+            'event': event,
+            'player': player.name if player else None
+        }
+        record.update(fields)
+        self.writer.record(record)
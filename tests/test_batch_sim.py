@@ -0,0 +1,27 @@
+"""Tests for the vectorized batch simulator against its pure Python reference."""
+
+import pytest
+
+from batch_sim import BatchSimulator
+from constants import BOARD_WIDTH, BOARD_HEIGHT
+
+np = pytest.importorskip('numpy')
+
+
+def test_placement_clears_lines_before_rating():
+    # Two bottom rows filled except the first two columns: only an O there clears them
+    simulator = BatchSimulator(jitter=False)
+    boards = np.zeros((1, BOARD_HEIGHT), dtype=np.int64)
+    boards[0, -2:] = ((1 << BOARD_WIDTH) - 1) & ~0b11
+    weights = np.array([[10.0, 0.0, 0.0, 0.0]])
+    rows = np.arange(BOARD_HEIGHT)
+    placed, cleared = simulator._place(boards, weights, simulator._table('O'), None, rows)
+    assert cleared.tolist() == [2]
+    assert not placed.any()
+
+
+def test_batched_games_match_python_games():
+    jobs = [(seed, None) for seed in range(4)]
+    batched = BatchSimulator(batch_size=3, max_pieces=60, jitter=False).run(jobs)
+    python = BatchSimulator(max_pieces=60, jitter=False, use_numpy=False).run(jobs)
+    assert batched == python
@@ -0,0 +1,60 @@
+"""Tests for the drop computations of the bitboard."""
+
+import random
+
+from board import Board
+from pieces import DISTINCT_ROTATIONS, get_rotation
+
+
+def _reference_drop(board, masks, x, y):
+    """Drop a piece row by row from (x, y); returns -1 if it collides there"""
+    if board.collides(masks, x, y):
+        return -1
+    while not board.collides(masks, x, y + 1):
+        y += 1
+    return y
+
+
+def test_landing_under_overhang_over_empty_well():
+    board = Board()
+    board.rows[1] = 0b1111
+    board.rows[11] = 0b1111
+    piece = get_rotation('I', 2)
+    assert board.landing(piece, 0) == 8
+    assert board.drop_y(piece, 0) == 8
+
+
+def test_landing_is_minus_one_when_blocked_at_the_top():
+    board = Board()
+    piece = get_rotation('I', 2)
+    board.rows[2] = 0b1
+    assert board.landing(piece, 0) == -1
+
+
+def test_landing_and_drop_match_row_by_row_drop_on_random_boards():
+    rng = random.Random(3)
+    for _ in range(300):
+        board = Board()
+        for row in range(rng.randrange(board.height)):
+            board.rows[board.height - 1 - row] = rng.getrandbits(board.width)
+        # Overhangs floating over empty rows
+        for _ in range(rng.randrange(3)):
+            board.rows[rng.randrange(board.height)] |= rng.getrandbits(board.width)
+        board.version += 1
+
+        for rotations in DISTINCT_ROTATIONS.values():
+            for rotation in rotations:
+                masks = rotation.masks
+                for x in rotation.x_positions():
+                    assert board.landing(rotation, x) == _reference_drop(board, masks, x, 0)
+                    for y in range(-2, board.height):
+                        if not board.collides(masks, x, y):
+                            assert board.drop_y(rotation, x, y) == _reference_drop(board, masks, x, y)
+
+
+def test_landing_cache_follows_the_board_version():
+    board = Board()
+    piece = get_rotation('O')
+    assert board.landing(piece, 0) == board.height - 2 - piece.top
+    board.place(piece.masks, 0, board.landing(piece, 0))
+    assert board.landing(piece, 0) == board.height - 4 - piece.top
@@ -0,0 +1,75 @@
+"""Tests for the incrementally maintained board features."""
+
+import random
+
+from board import Board
+from features import BoardFeatures
+from pieces import DISTINCT_ROTATIONS, TETROMINOES
+
+FIELDS = (
+    'heights', 'holes', 'row_fill', 'aggregate_height', 'total_holes', 'bumpiness',
+    'completed_lines'
+)
+
+
+def _assert_features_match(features, board):
+    """Check incremental features against a full rescan of the board"""
+    expected = BoardFeatures.from_board(board)
+    for field in FIELDS:
+        assert getattr(features, field) == getattr(expected, field), field
+
+
+def _random_board(rng):
+    """Return a board with random rows at the bottom and a few overhangs"""
+    board = Board()
+    for row in range(rng.randrange(board.height // 2)):
+        gap = 1 << rng.randrange(board.width)
+        board.rows[board.height - 1 - row] = rng.getrandbits(board.width) & ~gap
+    for _ in range(rng.randrange(3)):
+        row = rng.randrange(board.height // 2, board.height)
+        board.rows[row] |= rng.getrandbits(board.width)
+    return board
+
+
+def test_place_and_clear_match_a_full_rescan():
+    rng = random.Random(5)
+    for _ in range(200):
+        board = _random_board(rng)
+        features = BoardFeatures.from_board(board)
+        for _ in range(30):
+            rotation = rng.choice(DISTINCT_ROTATIONS[rng.choice(TETROMINOES)])
+            x = rng.choice(rotation.x_positions())
+            y = board.landing(rotation, x)
+            if y < 0:
+                break
+            board.place(rotation.masks, x, y)
+            features.place(rotation, x, y)
+            _assert_features_match(features, board)
+
+            rows = board.clear_rows()
+            assert features.clear_lines(board, rows) == len(rows)
+            _assert_features_match(features, board)
+
+
+def test_clear_lines_finds_completed_rows_itself():
+    board = Board()
+    board.rows[-1] = board.full_mask
+    board.rows[-2] = board.full_mask ^ 1
+    board.rows[-3] = board.full_mask
+    board.rows[-4] = 0b110
+    features = BoardFeatures.from_board(board)
+    assert features.completed_lines == 2
+
+    board.clear_rows()
+    assert features.clear_lines(board) == 2
+    _assert_features_match(features, board)
+    assert features.heights[:3] == [0, 2, 2]
+
+
+def test_copy_is_independent():
+    board = Board()
+    features = BoardFeatures.from_board(board)
+    copy = features.copy()
+    rotation = DISTINCT_ROTATIONS['O'][0]
+    copy.place(rotation, 0, board.landing(rotation, 0))
+    _assert_features_match(features, board)
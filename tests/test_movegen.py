@@ -0,0 +1,103 @@
+"""Tests for move generation over piece states."""
+
+import random
+from collections import deque
+
+from board import Board
+from movegen import (
+    LEFT, RIGHT, ROTATE, DOWN, DROP, find_path, placement_key, reachable_placements, trim_drop
+)
+from pieces import ROTATIONS, TETROMINOES, get_rotation
+
+
+def _naive_placements(board, piece, x, y):
+    """Lock positions found by a plain BFS over single left, right, rotate and down moves"""
+    seen = {(piece.rotation, x, y)}
+    queue = deque([(piece, x, y)])
+    locks = set()
+    while queue:
+        piece, x, y = queue.popleft()
+        rotated = ROTATIONS[piece.shape][(piece.rotation + 1) % len(ROTATIONS[piece.shape])]
+        moves = ((piece, x - 1, y), (piece, x + 1, y), (rotated, x, y), (piece, x, y + 1))
+        for next_piece, next_x, next_y in moves:
+            state = (next_piece.rotation, next_x, next_y)
+            if state not in seen and not board.collides(next_piece.masks, next_x, next_y):
+                seen.add(state)
+                queue.append((next_piece, next_x, next_y))
+        if board.collides(piece.masks, x, y + 1):
+            locks.add(placement_key(piece, x, y))
+    return locks
+
+
+def _play(board, piece, x, y, path):
+    """Play a path with the game's move rules, failing on any blocked input"""
+    for move in path:
+        next_piece, next_x, next_y = piece, x, y
+        if move == LEFT:
+            next_x -= 1
+        elif move == RIGHT:
+            next_x += 1
+        elif move == ROTATE:
+            next_piece = ROTATIONS[piece.shape][(piece.rotation + 1) % len(ROTATIONS[piece.shape])]
+        elif move == DOWN:
+            next_y += 1
+        elif move == DROP:
+            next_y = board.drop_y(piece, x, y)
+        assert not board.collides(next_piece.masks, next_x, next_y), move
+        piece, x, y = next_piece, next_x, next_y
+    return piece, x, y
+
+
+def _random_board(rng):
+    """Return a board with a ragged stack, holes and overhangs"""
+    board = Board()
+    for row in range(rng.randrange(4, 12)):
+        row_mask = rng.getrandbits(board.width) & rng.getrandbits(board.width)
+        board.rows[board.height - 1 - row] = row_mask
+    return board
+
+
+def test_placements_match_a_naive_search_and_paths_reach_them():
+    rng = random.Random(11)
+    for _ in range(60):
+        board = _random_board(rng)
+        for shape in TETROMINOES:
+            piece = get_rotation(shape)
+            placements = reachable_placements(board, piece, piece.spawn_x, 0)
+
+            keys = [placement_key(*placement[:3]) for placement in placements]
+            assert len(keys) == len(set(keys))
+            assert set(keys) == _naive_placements(board, piece, piece.spawn_x, 0)
+            for target, target_x, target_y, path in placements:
+                assert board.collides(target.masks, target_x, target_y + 1)
+                end = _play(board, piece, piece.spawn_x, 0, path)
+                assert placement_key(*end) == placement_key(target, target_x, target_y)
+
+
+def test_tuck_under_an_overhang_is_reachable():
+    board = Board()
+    board.rows[-2] = 0b1111111000
+    board.rows[-1] = 0b1111111000
+    board.rows[-3] = 0b1111111100
+    piece = get_rotation('O')
+    target = get_rotation('O')
+    path = find_path(board, piece, piece.spawn_x, 0, target, 1, board.height - 2)
+    assert path is not None and path[-1] == RIGHT
+    assert placement_key(*_play(board, piece, piece.spawn_x, 0, path)) == placement_key(
+        target, 1, board.height - 2
+    )
+
+
+def test_sealed_cavity_is_unreachable():
+    board = Board()
+    board.rows[-3] = board.full_mask ^ 0b1
+    board.rows[-2] = 0
+    board.rows[-1] = 0
+    piece = get_rotation('O')
+    assert find_path(board, piece, piece.spawn_x, 0, piece, 4, board.height - 2) is None
+
+
+def test_trim_drop_removes_trailing_falls_only():
+    assert trim_drop((LEFT, DOWN, ROTATE, DOWN, DROP)) == (LEFT, DOWN, ROTATE)
+    assert trim_drop((DROP,)) == ()
+    assert trim_drop((RIGHT,)) == (RIGHT,)
@@ -0,0 +1,87 @@
+"""Tests for replay recording, re-simulation and seeking."""
+
+import io
+import random
+
+import pytest
+
+from engine import GameEngine
+from movegen import DROP
+from replay import (
+    MOVES, Replay, ReplayPlayer, ReplayRecorder, read_varint, unzigzag, write_varint, zigzag
+)
+
+
+def _state(engine):
+    """Return everything visible about a match"""
+    return (engine.clock, engine.game_over) + tuple(
+        (tuple(player.board.rows), player.shape, player.x, player.y, player.pieces_placed,
+         player.lines_cleared, engine.get_score(player))
+        for player in engine.players()
+    )
+
+
+def _record_match(directory, seed, rng):
+    """Play a match with random inputs for both players until it ends; returns its recording"""
+    engine = GameEngine(seed)
+    recorder = ReplayRecorder(engine, str(directory))
+    engine.start()
+    while not engine.game_over:
+        for player in engine.players():
+            if rng.random() < 0.5:
+                engine.input(player, DROP if rng.random() < 0.2 else rng.choice(MOVES))
+        engine.advance(rng.randrange(20, 400))
+    recorder.close()
+    return engine, recorder.path
+
+
+def test_varints_and_zigzag_round_trip():
+    for value in (0, 1, 127, 128, 300, 2 ** 32 + 5):
+        output = io.BytesIO()
+        write_varint(output, value)
+        assert read_varint(output.getvalue(), 0) == (value, len(output.getvalue()))
+    for value in (-130, -1, 0, 1, 129):
+        assert zigzag(value) >= 0 and unzigzag(zigzag(value)) == value
+
+
+def test_replay_resimulates_the_recorded_match(tmp_path):
+    engine, path = _record_match(tmp_path, 42, random.Random(1))
+    replay = Replay.load(path)
+    assert replay.seed == 42 and replay.policy == engine.policy
+
+    player = ReplayPlayer(replay)
+    replayed = player.run()
+    assert not player.diverged
+    assert player.locks == len(player.recorded_locks)
+    # The recording ends at game over, while the original clock ran on to the end of its step
+    assert replayed.clock == replay.duration() <= engine.clock
+    assert _state(replayed)[1:] == _state(engine)[1:]
+
+
+def test_seeking_back_and_forth_matches_playing_straight_through(tmp_path):
+    _, path = _record_match(tmp_path, 7, random.Random(2))
+    replay = Replay.load(path)
+    duration = replay.duration()
+    times = sorted({duration // 3, duration // 2, duration - 1, 1500})
+
+    expected = {}
+    straight = ReplayPlayer(replay, snapshot_interval=1000)
+    for ms in times:
+        straight.advance_to(ms)
+        expected[ms] = _state(straight.engine)
+
+    seeking = ReplayPlayer(replay, snapshot_interval=1000)
+    seeking.run()
+    for ms in reversed(times):
+        seeking.seek(ms)
+        assert _state(seeking.engine) == expected[ms]
+    seeking.seek(times[-1])
+    assert _state(seeking.engine) == expected[times[-1]]
+    assert not seeking.diverged
+
+
+def test_loading_a_foreign_file_fails(tmp_path):
+    path = tmp_path / "other.trpl"
+    path.write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        Replay.load(str(path))
@@ -0,0 +1,80 @@
+"""Tests for the commands of the asyncio match server."""
+
+import asyncio
+
+from server import MatchServer, MatchClient
+
+
+async def _reply_to(command, **fields):
+    """Send one command to a fresh server and return its reply and a later list reply"""
+    server = MatchServer(ai_workers=1)
+    listener = await server.start('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        client = await MatchClient.connect('127.0.0.1', port)
+        await client.send(command, **fields)
+        reply = await asyncio.wait_for(client.receive(), 5)
+        await client.send('list')
+        listing = await asyncio.wait_for(client.receive(), 5)
+        while listing['type'] != 'matches':
+            listing = await asyncio.wait_for(client.receive(), 5)
+        await client.close()
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+    return reply, listing
+
+
+def test_join_with_unknown_policy_is_reported():
+    reply, listing = asyncio.run(_reply_to('join', policy='nope'))
+    assert reply == {'type': 'error', 'error': 'unknown policy: nope'}
+    assert listing['type'] == 'matches' and not listing['matches']
+
+
+def test_join_with_non_integer_seed_is_reported():
+    reply, listing = asyncio.run(_reply_to('join', seed=[1]))
+    assert reply['type'] == 'error' and 'seed' in reply['error']
+    assert listing['type'] == 'matches' and not listing['matches']
+
+
+def test_join_starts_a_match():
+    reply, listing = asyncio.run(_reply_to('join', seed=7, policy='bag'))
+    assert reply['type'] == 'joined'
+    assert [match['match'] for match in listing['matches']] == [reply['match']]
+
+
+def test_snapshot_with_non_integer_match_is_reported():
+    reply, listing = asyncio.run(_reply_to('snapshot', match=[1]))
+    assert reply['type'] == 'error' and 'match' in reply['error']
+    assert listing['type'] == 'matches'
+
+
+async def _failing_ai_match():
+    """Join a match whose AI search raises and return the messages until it closes"""
+    server = MatchServer(ai_workers=1)
+    listener = await server.start('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    messages = []
+    try:
+        client = await MatchClient.connect('127.0.0.1', port)
+        await client.send('join', seed=3)
+        while not messages or messages[-1]['type'] != 'closed':
+            messages.append(await asyncio.wait_for(client.receive(), 5))
+        await client.close()
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+    return messages
+
+
+def test_failed_ai_search_ends_the_match(monkeypatch, capsys):
+    def fail(*args, **kwargs):
+        raise RuntimeError("search exploded")
+
+    monkeypatch.setattr('server.TetrisAI.plan_move', fail)
+    messages = asyncio.run(_failing_ai_match())
+    assert {'type': 'error', 'match': messages[0]['match'], 'error': "AI decision failed"} in messages
+    assert messages[-1]['type'] == 'closed'
+    assert "search exploded" in capsys.readouterr().err
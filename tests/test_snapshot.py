@@ -0,0 +1,75 @@
+"""Tests for full and delta snapshot frames."""
+
+import random
+
+import pytest
+
+from constants import BOARD_WIDTH
+from engine import GameEngine
+from movegen import DROP
+from replay import MOVES
+from snapshot import (
+    FORMAT_VERSION, ResyncRequired, SnapshotDecoder, SnapshotEncoder, board_state, encode_full
+)
+
+
+def _match_states(seed):
+    """Play a match with random inputs and return the successive states of its first board"""
+    rng = random.Random(seed)
+    engine = GameEngine(seed)
+    player = next(iter(engine.players()))
+    engine.start()
+    states = [board_state(engine, player)]
+    while not engine.game_over and len(states) < 400:
+        for other in engine.players():
+            if rng.random() < 0.5:
+                engine.input(other, DROP if rng.random() < 0.2 else rng.choice(MOVES))
+        engine.advance(rng.randrange(20, 400))
+        states.append(board_state(engine, player))
+    return states
+
+
+def test_full_frame_round_trips():
+    state = _match_states(1)[-1]
+    assert SnapshotDecoder().apply(encode_full(state, 7, BOARD_WIDTH)) == state
+
+
+def test_deltas_follow_the_encoded_states():
+    encoder = SnapshotEncoder(BOARD_WIDTH)
+    decoder = SnapshotDecoder()
+    decoded = None
+    for state in _match_states(2):
+        frame = encoder.encode(state)
+        if frame is not None:
+            decoded = decoder.apply(frame)
+        assert decoded == state
+
+
+def test_unchanged_state_encodes_nothing():
+    encoder = SnapshotEncoder(BOARD_WIDTH)
+    state = _match_states(3)[0]
+    assert encoder.encode(state) is not None
+    assert encoder.encode(state) is None
+
+
+def test_missing_frame_requires_a_keyframe():
+    states = _match_states(4)
+    encoder = SnapshotEncoder(BOARD_WIDTH)
+    decoder = SnapshotDecoder()
+    decoder.apply(encoder.encode(states[0]))
+    changed = [state for previous, state in zip(states, states[1:]) if state != previous]
+    encoder.encode(changed[0])
+    with pytest.raises(ResyncRequired):
+        decoder.apply(encoder.encode(changed[1]))
+    # Later deltas are refused too until a full frame arrives
+    with pytest.raises(ResyncRequired):
+        decoder.apply(encoder.encode(changed[2]))
+    assert decoder.apply(encoder.keyframe()) == changed[2]
+    assert decoder.apply(encoder.encode(changed[3])) == changed[3]
+
+
+def test_unsupported_version_is_rejected():
+    frame = bytearray(encode_full(_match_states(5)[0], 1, BOARD_WIDTH))
+    frame[0] = FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        SnapshotDecoder().apply(bytes(frame))
@@ -1,23 +1,39 @@
 import tkinter as tk
-import random
-import time
 from constants import *
-from ai import TetrisAI
-from score import ScoreManager
+from ai import TetrisAI, load_weights, time_budget
+from ai_worker import AIWorker
+from movegen import LEFT, RIGHT, ROTATE, DOWN, DROP, find_path, trim_drop
+from replay import ReplayRecorder
+from telemetry import MatchTelemetry, TelemetryWriter
+from engine import GameEngine
+from renderer import BoardRenderer
+from scheduler import GameScheduler
+from instrumentation import metrics
 
 class TetrisGame:
     def __init__(self, master):
         """Initialize the Tetris game with two boards - human and AI"""
         
-        self.start_time = 0  # Time when the game starts
         self.elapsed_time = 0  # Total time elapsed
         self.timer_text = None  # Reference to the timer text object
 
         self.master = master
-        self.score_manager = ScoreManager()
         
-        self.human_next_piece = None
-        self.ai_next_piece = None
+        # The engine holds the rules and state of both boards
+        self.engine = GameEngine()
+        self.engine.add_listener(self._on_game_event)
+        self.score_manager = self.engine.score_manager
+        
+        # Every match is recorded as a compact replay
+        self.recorder = ReplayRecorder(self.engine) if REPLAY_RECORDING else None
+        
+        # Telemetry records are written by a background thread, off the game loop
+        self.telemetry = None
+        if TELEMETRY_ENABLED:
+            self.telemetry = MatchTelemetry(self.engine, TelemetryWriter(TELEMETRY_FILE))
+        
+        # A single scheduler runs the game logic at a fixed timestep
+        self.scheduler = GameScheduler(master, self.engine, on_frame=self._render_frame)
         
         # Create the game canvas
         self.canvas = tk.Canvas(
@@ -28,37 +44,28 @@ class TetrisGame:
         )
         self.canvas.pack()
         
+        # Close the game's files and threads when the window goes away
+        self.canvas.bind("<Destroy>", self._on_destroy)
+        
         # Initialize game state variables
         self.is_running = False
         self.paused = False
-        self.game_over = False
-        self.using_alt_colors = False
-        self.color_change_timer = None
-        self.flash_timer = None # ADD THIS
-        self.slowdown_timer = None
-        
-        # Initialize human board
-        self.human_board = self._create_empty_board()
-        self.human_current_piece = None
-        self.human_current_shape = None
-        self.human_current_x = 0
-        self.human_current_y = 0
-        self.human_fall_speed = INITIAL_SPEED
-        self.human_is_slowed = False
-        self.human_slowdown_timer = None
-        
-        # Initialize AI board
-        self.ai_board = self._create_empty_board()
-        self.ai_current_piece = None
-        self.ai_current_shape = None
-        self.ai_current_x = 0
-        self.ai_current_y = 0
-        self.ai_fall_speed = INITIAL_SPEED
-        self.ai_is_slowed = False
-        self.ai_slowdown_timer = None
-        
-        # Create AI player
-        self.ai = TetrisAI(self)
+        self.flash_timer = None
+        self.dump_timer = None
+        self.highlight_timers = {}
+        self.show_debug = False
+        
+        # Create AI player, using a tuned weight profile when one was saved;
+        # it searches as deep as AI_MAX_DEPTH when its time budget allows
+        self.ai = TetrisAI(self, depth=AI_MAX_DEPTH, weights=load_weights(AI_WEIGHTS_FILE))
+        
+        # The AI thinks in a background thread; results are matched to the
+        # piece they were computed for by a token
+        self.ai_worker = AIWorker(self.ai)
+        self.ai_token = None
+        self.ai_move = None
+        self.ai_move_due = False
+        self.scheduler.add_poller(self._poll_ai_results)
         
         # Set up key bindings for human player
         self.master.bind("<Left>", self._move_left)
@@ -67,20 +74,24 @@ class TetrisGame:
         self.master.bind("<Up>", self._rotate)
         self.master.bind("<space>", self._hard_drop)
         self.master.bind("p", self._toggle_pause)
+        self.master.bind("f", self._toggle_fast_forward)
+        self.master.bind("d", self._toggle_debug_overlay)
         
         # Create UI elements
         self._create_ui()
         
-    def _create_empty_board(self):
-        """Create an empty Tetris board"""
-        return [[0 for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-    
     def _create_ui(self):
         """Create the game's UI elements"""
         # Draw borders for both boards
         self._draw_board_border(HUMAN_BOARD_X, BOARD_Y, "Human Player")
         self._draw_board_border(AI_BOARD_X, BOARD_Y, "AI Player")
         
+        # Board cells and falling pieces, created once and updated in place
+        self.human_renderer = BoardRenderer(
+            self.canvas, HUMAN_BOARD_X, BOARD_Y, "human_board", ghost=SHOW_GHOST_PIECE
+        )
+        self.ai_renderer = BoardRenderer(self.canvas, AI_BOARD_X, BOARD_Y, "ai_board")
+        
         # Score displays
         self.human_score_text = self.canvas.create_text(
             HUMAN_BOARD_X + (BOARD_WIDTH * BLOCK_SIZE) // 2,
@@ -107,8 +118,8 @@ class TetrisGame:
             fill=TEXT_COLOR
         )
         
-        # Next piece preview labels
-        self.canvas.create_text(
+        # Next piece preview labels, listing the upcoming shapes
+        self.human_preview_text = self.canvas.create_text(
             HUMAN_BOARD_X + (BOARD_WIDTH * BLOCK_SIZE) // 2,
             BOARD_Y - 30,
             text="Next Piece:",
@@ -116,7 +127,7 @@ class TetrisGame:
             fill=TEXT_COLOR
         )
         
-        self.canvas.create_text(
+        self.ai_preview_text = self.canvas.create_text(
             AI_BOARD_X + (BOARD_WIDTH * BLOCK_SIZE) // 2,
             BOARD_Y - 30,
             text="Next Piece:",
@@ -133,8 +144,19 @@ class TetrisGame:
             fill=BONUS_TEXT_COLOR
         )
         
+        # Debug overlay with the instrumentation metrics, hidden until toggled
+        self.debug_text = self.canvas.create_text(
+            10,
+            10,
+            text="",
+            anchor="nw",
+            font=("Courier", 9),
+            fill=TEXT_COLOR,
+            state="hidden"
+        )
+        
         # Help text for controls
-        controls_text = "Controls: ← → Move | ↑ Rotate | ↓ Soft Drop | \n\n Space Hard Drop | P Pause "
+        controls_text = "Controls: ← → Move | ↑ Rotate | ↓ Soft Drop | \n\n Space Hard Drop | P Pause | F Fast-Forward | D Debug "
         self.canvas.create_text(
             WINDOW_WIDTH // 2,
             WINDOW_HEIGHT - 30,
@@ -163,124 +185,115 @@ class TetrisGame:
             width=2
         )
     
+
     def start(self):
         """Start the game"""
         if not self.is_running:
             self.is_running = True
-            self.game_over = False
+            self.paused = False
             
-            
-            self.start_time = time.time()  # Record the start time
-            self._update_timer()  # Start updating the timer display
-            
-            # Reset scores
-            self.score_manager.reset_scores()
+            # Reset scores and boards, and create initial pieces
+            self.human_renderer.clear_highlight()
+            self.ai_renderer.clear_highlight()
+            self.engine.start()
             self._update_score_display()
             
-            # Create initial pieces
-            self._new_human_piece()
-            self._new_ai_piece()
-            
-            # Start color change timer
-            self._schedule_color_change()
-            
-            # Start game loops
-            self._human_game_loop()
-            self._ai_game_loop()
-    
-    def _schedule_color_change(self):
-        """Schedule the color change special effect"""
-        self.master.after(COLOR_CHANGE_INTERVAL, self._start_color_change)
+            # Start the game logic and draw the first frame
+            self.dump_timer = None
+            self._schedule_metrics_dump()
+            self.scheduler.start()
+            self._render_frame()
+    
+    def _render_frame(self):
+        """
+        Draw the current game state, called by the scheduler at most RENDER_FPS times a second
+        Input handlers only change the engine; the changes show up in the next frame
+        """
+        self._update_timer()
+        self._redraw_boards()
+        if self.show_debug:
+            self._update_debug_overlay()
+    
+    def _on_game_event(self, event, player=None, **data):
+        """React to events raised by the game engine"""
+        if event == 'lock':
+            self._update_score_display()
+            if data['rows']:
+                self._highlight_cleared_rows(player, data['rows'])
+            if not player.is_human:
+                # Any decision still on its way is for the piece that just locked
+                self.ai_token = None
+                self.ai_move = None
+        elif event == 'spawn':
+            self._update_preview(player)
+            if not player.is_human:
+                # Let the AI think about its move while the piece waits AI_MOVE_DELAY
+                self._request_ai_move(player)
+        elif event == 'gift':
+            self._update_preview(player)
+            self._show_status_message(f"Surprise Gift for {player.name}!")
+        elif event == 'slowdown_start':
+            self._show_status_message("Slowdown Bonus activated for both players!")
+        elif event == 'slowdown_end':
+            self._clear_status_message()
+        elif event == 'special_piece':
+            self._update_preview(player)
+            self._show_status_message(f"Special Piece Coming for {player.name}!")
+        elif event == 'color_change_start':
+            self._start_color_change()
+        elif event == 'color_change_end':
+            self._end_color_change()
+        elif event == 'game_over':
+            self._game_over()
+    
+    def _highlight_cleared_rows(self, player, rows):
+        """Outline the rows where a player just cleared lines, for LINE_CLEAR_HIGHLIGHT"""
+        renderer = self.human_renderer if player.is_human else self.ai_renderer
+        renderer.highlight_rows(rows, LINE_CLEAR_COLOR)
+        self.scheduler.cancel(self.highlight_timers.get(player.name))
+        self.highlight_timers[player.name] = self.scheduler.schedule(
+            LINE_CLEAR_HIGHLIGHT, renderer.clear_highlight
+        )
     
     def _start_color_change(self):
         """Start the color change effect"""
-        if not self.game_over:
-            self.using_alt_colors = True
-            self._show_status_message("Color Change Activated!")
-            self._start_flashing_colors() # call the new flash color method
-
-            # Schedule end of color change
-            self.color_change_timer = self.master.after(COLOR_CHANGE_DURATION, self._end_color_change)
-
-            # Schedule next color change
-            self._schedule_color_change()
-
+        self._show_status_message("Color Change Activated!")
+        self._start_flashing_colors()
+    
     def _end_color_change(self):
         """End the color change effect"""
-        if not self.game_over:
-            self.using_alt_colors = False
-            self._clear_status_message()
-            
-            # Cancel the flash timer
-            if self.flash_timer:
-                self.master.after_cancel(self.flash_timer)
-                self.flash_timer = None
-                
-            self._redraw_boards()  # redraw one last time with the normal colors
+        self._clear_status_message()
+        
+        # Cancel the flash timer
+        self.scheduler.cancel(self.flash_timer)
+        self.flash_timer = None
 
     def _start_flashing_colors(self):
         """Create a rainbow effect by cycling through colors"""
-        if self.using_alt_colors:
+        if self.engine.using_alt_colors:
             # Create rainbow colors that cycle
             rainbow_colors = ["#FF0000", "#FF7F00", "#FFFF00", "#00FF00", "#0000FF", "#4B0082", "#9400D3"]
             
-            # Get the current time to determine which color to use
-            current_time = int(time.time() * 1000) % (len(rainbow_colors) * FLASH_SPEED)
+            # Get the current game time to determine which color to use
+            current_time = self.engine.clock % (len(rainbow_colors) * FLASH_SPEED)
             color_index = current_time // FLASH_SPEED
             
             # Override the ALT_PIECE_COLORS with the current rainbow color
             for shape in PIECE_COLORS:
                 ALT_PIECE_COLORS[shape] = rainbow_colors[color_index % len(rainbow_colors)]
             
-            # Redraw with the current color state
-            self._redraw_boards()
-            
-            # Schedule next flash
-            self.flash_timer = self.master.after(FLASH_SPEED, self._start_flashing_colors)
+            # Schedule next flash; the next frame draws the new colors
+            self.flash_timer = self.scheduler.schedule(FLASH_SPEED, self._start_flashing_colors)
     
     def _update_timer(self):
-        """Update the timer display every second"""
-        if self.is_running and not self.game_over:
-            self.elapsed_time = int(time.time() - self.start_time)
+        """Update the timer display with the game time"""
+        elapsed_time = self.engine.clock // 1000
+        if elapsed_time != self.elapsed_time:
+            self.elapsed_time = elapsed_time
             minutes = self.elapsed_time // 60
             seconds = self.elapsed_time % 60
             timer_string = f"Time: {minutes:02}:{seconds:02}"
             self.canvas.itemconfig(self.timer_text, text=timer_string)
-            self.master.after(1000, self._update_timer) 
-
-    def _activate_slowdown(self):
-        """Activate the slowdown bonus for both players"""
-        # Human player slowdown
-        if not self.human_is_slowed:
-            self.human_is_slowed = True
-            self.human_fall_speed = int(self.human_fall_speed / SLOWDOWN_PERCENTAGE)
-        if self.human_slowdown_timer is not None:
-            self.master.after_cancel(self.human_slowdown_timer)
-        self.human_slowdown_timer = self.master.after(SLOWDOWN_BONUS_DURATION, self._end_human_slowdown)
-
-        # AI player slowdown
-        if not self.ai_is_slowed:
-            self.ai_is_slowed = True
-            self.ai_fall_speed = int(self.ai_fall_speed / SLOWDOWN_PERCENTAGE)
-        if self.ai_slowdown_timer is not None:
-            self.master.after_cancel(self.ai_slowdown_timer)
-        self.ai_slowdown_timer = self.master.after(SLOWDOWN_BONUS_DURATION, self._end_ai_slowdown)
-
-        self._show_status_message("Slowdown Bonus activated for both players!")
-    
-    def _end_human_slowdown(self):
-        """End the slowdown bonus for the human player"""
-        if not self.game_over:
-            self.human_is_slowed = False
-            self.human_fall_speed = int(self.human_fall_speed * SLOWDOWN_PERCENTAGE)
-            self._clear_status_message()
-    
-    def _end_ai_slowdown(self):
-        """End the slowdown bonus for the AI player"""
-        if not self.game_over:
-            self.ai_is_slowed = False
-            self.ai_fall_speed = int(self.ai_fall_speed * SLOWDOWN_PERCENTAGE)
-            self._clear_status_message()
     
     def _show_status_message(self, message):
         """Display a status message on the screen"""
@@ -290,6 +303,12 @@ class TetrisGame:
         """Clear the status message"""
         self.canvas.itemconfig(self.status_text, text="")
     
+    def _update_preview(self, player):
+        """Show the upcoming shapes of a player above its board"""
+        text_item = self.human_preview_text if player.is_human else self.ai_preview_text
+        shapes = " ".join(self.engine.preview(player))
+        self.canvas.itemconfig(text_item, text=f"Next Piece: {shapes}")
+    
     def _update_score_display(self):
         """Update the score displays for both players"""
         self.canvas.itemconfig(
@@ -301,256 +320,78 @@ class TetrisGame:
             text=f"Score: {self.score_manager.get_ai_score()}"
         )
     
-    def _human_game_loop(self):
-        """Main game loop for the human player"""
-        if not self.paused and self.is_running and not self.game_over:
-            if self._check_collision(self.human_board, self.human_current_piece, 
-                                    self.human_current_x, self.human_current_y + 1):
-                # Place the piece on the board and check for completed lines
-                self._place_piece(self.human_board, self.human_current_piece, 
-                                 self.human_current_x, self.human_current_y)
-                lines_cleared = self._clear_lines(self.human_board)
-                
-                # Update score and check for special actions
-                score_added = self.score_manager.update_human_score(lines_cleared)
-                self._update_score_display()
-                
-                # Check for special rules
-                self._check_special_rules(lines_cleared, score_added, True)
-                
-                # Create a new piece
-                if not self._new_human_piece():
-                    self._game_over()
-                    return
-            else:
-                # Move the piece down
-                self.human_current_y += 1
-            
-            # Redraw the board
-            self._redraw_human_board()
-            
-            # Schedule the next loop iteration
-            self.master.after(self.human_fall_speed, self._human_game_loop)
-    
-    def _ai_game_loop(self):
-        """Main game loop for the AI player"""
-        if not self.paused and self.is_running and not self.game_over:
-            if self._check_collision(self.ai_board, self.ai_current_piece, 
-                                    self.ai_current_x, self.ai_current_y + 1):
-                # Place the piece on the board and check for completed lines
-                self._place_piece(self.ai_board, self.ai_current_piece, 
-                                 self.ai_current_x, self.ai_current_y)
-                lines_cleared = self._clear_lines(self.ai_board)
-                
-                # Update score and check for special actions
-                score_added = self.score_manager.update_ai_score(lines_cleared)
-                self._update_score_display()
-                
-                # Check for special rules
-                self._check_special_rules(lines_cleared, score_added, False)
-                
-                # Create a new piece
-                if not self._new_ai_piece():
-                    self._game_over()
-                    return
-                
-                # Let the AI make its move
-                self.master.after(AI_MOVE_DELAY, self._ai_make_move)
-            else:
-                # Move the piece down
-                self.ai_current_y += 1
-            
-            # Redraw the board
-            self._redraw_ai_board()
-            
-            # Schedule the next loop iteration
-            self.master.after(self.ai_fall_speed, self._ai_game_loop)
-    
-    def _check_special_rules(self, lines_cleared, score_added, is_human):
-        """Check and apply special rules based on game events"""
-        human_score = self.score_manager.get_human_score()
-        ai_score = self.score_manager.get_ai_score()
-        
-        # Surprise Gift: Clearing 2 lines grants the opponent an easy piece
-        if lines_cleared == 2:
-            self._show_status_message(f"Surprise Gift for {'AI' if is_human else 'Human'}!")
-            # Next piece for opponent will be easy (I or O shape)
-            if is_human:
-                self.ai_next_piece_override = random.choice(['I', 'O'])
-            else:
-                self.human_next_piece_override = random.choice(['I', 'O'])
-        
-        # Slowdown Bonus: Every 1000 points, pieces fall 20% slower for 10 seconds
-        current_score = human_score if is_human else ai_score
-        if current_score // SLOWDOWN_BONUS_THRESHOLD > (current_score - score_added) // SLOWDOWN_BONUS_THRESHOLD:
-            self._activate_slowdown() 
-        
-        # Special Piece: Every 3000 points, a unique-shaped piece appears
-        if current_score // SPECIAL_PIECE_THRESHOLD > (current_score - score_added) // SPECIAL_PIECE_THRESHOLD:
-            if is_human:
-                self.human_next_piece_override = 'SPECIAL'
-                self._show_status_message("Special Piece Coming for Human!")
-            else:
-                self.ai_next_piece_override = 'SPECIAL'
-                self._show_status_message("Special Piece Coming for AI!")
+    def _can_play(self):
+        """Check whether the game accepts moves"""
+        return not self.paused and self.is_running and not self.engine.game_over
+    
+    def _request_ai_move(self, player):
+        """
+        Send a snapshot of the AI board and piece to the worker thread
+        The search gets less time as the pieces fall faster, and in fast-forward,
+        where game time runs FAST_FORWARD_TICKS times faster than the wall clock
+        """
+        self.ai_token = player.revision
+        self.ai_move = None
+        self.ai_move_due = False
+        budget = time_budget(player.fall_speed)
+        if self.scheduler.fast_forward:
+            budget /= FAST_FORWARD_TICKS
+        self.ai_worker.submit(
+            self.ai_token,
+            player.board,
+            player.piece,
+            player.x,
+            player.y,
+            self.engine.upcoming_shape(player),
+            budget
+        )
+        self.scheduler.schedule(AI_MOVE_DELAY, self._ai_move_ready)
+    
+    def _ai_move_ready(self):
+        """
+        Allow the AI to move once AI_MOVE_DELAY has passed
+        The move is played by the next poll, between logic ticks like human input,
+        so replays can re-apply it at the same point of the game
+        """
+        self.ai_move_due = True
+    
+    def _poll_ai_results(self):
+        """
+        Collect finished AI decisions, discarding those for pieces that already locked
+        In fast-forward nothing is drawn, so the logic waits for the pending decision
+        """
+        wait = self.scheduler.fast_forward and self.ai_token is not None and self.ai_move is None
+        result = self.ai_worker.poll(wait)
+        while result is not None:
+            token, plan, seconds, depth = result
+            if token == self.ai_token and plan is not None:
+                self.ai_move = plan
+                if self.telemetry:
+                    self.telemetry.ai_decision(self.engine.ai, seconds, depth)
+            result = self.ai_worker.poll()
+        self._ai_make_move()
     
     def _ai_make_move(self):
-        """Let the AI make its move"""
-        if not self.paused and self.is_running and not self.game_over:
-            # Get AI's recommended move
-            best_x, best_rotation = self.ai.get_best_move(
-                self.ai_board, 
-                self.ai_current_piece, 
-                self.ai_current_shape
+        """
+        Steer the AI piece to its chosen placement, once the decision has arrived and is due
+        The final fall is left to gravity; if the piece fell while the AI was thinking,
+        the path is searched again from where the piece is now
+        """
+        if self.ai_move is None or not self.ai_move_due or not self._can_play():
+            return
+        player = self.engine.ai
+        target_piece, target_x, target_y, path = self.ai_move
+        self.ai_token = None
+        self.ai_move = None
+        
+        if player.y != 0 or player.x != player.piece.spawn_x or player.piece.rotation != 0:
+            path = find_path(
+                player.board, player.piece, player.x, player.y,
+                target_piece, target_x, target_y
             )
-            
-            # Apply rotations
-            current_rotation = 0
-            while current_rotation < best_rotation:
-                new_piece = self._rotate_piece(self.ai_current_piece)
-                if not self._check_collision(self.ai_board, new_piece, self.ai_current_x, self.ai_current_y):
-                    self.ai_current_piece = new_piece
-                current_rotation += 1
-            
-            # Move horizontally
-            while self.ai_current_x < best_x:
-                if not self._check_collision(self.ai_board, self.ai_current_piece, 
-                                            self.ai_current_x + 1, self.ai_current_y):
-                    self.ai_current_x += 1
-                else:
-                    break
-            
-            while self.ai_current_x > best_x:
-                if not self._check_collision(self.ai_board, self.ai_current_piece, 
-                                            self.ai_current_x - 1, self.ai_current_y):
-                    self.ai_current_x -= 1
-                else:
-                    break
-            
-            # Redraw the board
-            self._redraw_ai_board()
-    
-    def _new_human_piece(self):
-        """Create a new piece for the human player"""
-        # Check if there's an override (for special rules)
-        if hasattr(self, 'human_next_piece_override') and self.human_next_piece_override:
-            self.human_current_shape = self.human_next_piece_override
-            del self.human_next_piece_override
-        else:
-            # Select a random tetromino
-            self.human_current_shape = random.choice(list(SHAPES.keys()))
-            # Don't randomly select the special piece
-            while self.human_current_shape == 'SPECIAL':
-                self.human_current_shape = random.choice(list(SHAPES.keys()))
-        
-        # Get the tetromino shape
-        self.human_current_piece = SHAPES[self.human_current_shape][0]
-        
-        # Starting position
-        self.human_current_x = BOARD_WIDTH // 2 - len(self.human_current_piece[0]) // 2
-        self.human_current_y = 0
-        
-        # Check if the new piece can be placed
-        if self._check_collision(self.human_board, self.human_current_piece, 
-                               self.human_current_x, self.human_current_y):
-            return False  # Game over
-    
-        
-        return True
-    
-    def _new_ai_piece(self):
-        """Create a new piece for the AI player"""
-        # Check if there's an override (for special rules)
-        if hasattr(self, 'ai_next_piece_override') and self.ai_next_piece_override:
-            self.ai_current_shape = self.ai_next_piece_override
-            del self.ai_next_piece_override
-        else:
-            # Select a random tetromino
-            self.ai_current_shape = random.choice(list(SHAPES.keys()))
-            # Don't randomly select the special piece
-            while self.ai_current_shape == 'SPECIAL':
-                self.ai_current_shape = random.choice(list(SHAPES.keys()))
-        
-        # Get the tetromino shape
-        self.ai_current_piece = SHAPES[self.ai_current_shape][0]
-        
-        # Starting position
-        self.ai_current_x = BOARD_WIDTH // 2 - len(self.ai_current_piece[0]) // 2
-        self.ai_current_y = 0
-        
-        # Check if the new piece can be placed
-        if self._check_collision(self.ai_board, self.ai_current_piece, 
-                               self.ai_current_x, self.ai_current_y):
-            return False  # Game over
-        
-        return True
-    
-    def _check_collision(self, board, piece, x, y):
-        """Check if a piece collides with the board boundaries or other pieces"""
-        for row in range(len(piece)):
-            for col in range(len(piece[row])):
-                if piece[row][col]:
-                    # Check if piece is out of bounds
-                    if (y + row >= BOARD_HEIGHT or 
-                        x + col < 0 or 
-                        x + col >= BOARD_WIDTH):
-                        return True
-                    
-                    # Check if piece collides with another piece on the board
-                    if y + row >= 0 and board[y + row][x + col]:
-                        return True
-        
-        return False
-    
-    def _place_piece(self, board, piece, x, y):
-        """Place a piece on the board"""
-        for row in range(len(piece)):
-            for col in range(len(piece[row])):
-                if piece[row][col]:
-                    if 0 <= y + row < BOARD_HEIGHT and 0 <= x + col < BOARD_WIDTH:
-                        # Store the piece type along with the block
-                        if isinstance(piece[row][col], int) and piece[row][col] == 1:
-                            # For regular blocks
-                            board[y + row][x + col] = 1
-                        else:
-                            # For special blocks
-                            board[y + row][x + col] = piece[row][col]
-    
-    def _clear_lines(self, board):
-        """Clear completed lines and return the number of lines cleared"""
-        lines_cleared = 0
-        y = BOARD_HEIGHT - 1
-        while y >= 0:
-            # Check if line is complete
-            if all(board[y]):
-                lines_cleared += 1
-                # Move all lines above down
-                for y_above in range(y, 0, -1):
-                    for x in range(BOARD_WIDTH):
-                        board[y_above][x] = board[y_above - 1][x]
-                
-                # Clear the top line
-                for x in range(BOARD_WIDTH):
-                    board[0][x] = 0
-            else:
-                y -= 1
-        
-        return lines_cleared
-    
-    def _rotate_piece(self, piece):
-        """Rotate a piece 90 degrees clockwise"""
-        rows = len(piece)
-        cols = len(piece[0])
-        
-        # Create a new rotated piece
-        rotated = [[0 for _ in range(rows)] for _ in range(cols)]
-        
-        # Fill the rotated piece
-        for row in range(rows):
-            for col in range(cols):
-                rotated[col][rows - 1 - row] = piece[row][col]
-        
-        return rotated
+            if path is None:
+                return
+        self.engine.apply_path(player, trim_drop(path))
     
     def _redraw_boards(self):
         """Redraw both game boards"""
@@ -559,174 +400,144 @@ class TetrisGame:
     
     def _redraw_human_board(self):
         """Redraw the human player's board"""
-        # Clear the existing board
-        self.canvas.delete("human_board")
-        
-        # Draw the grid
-        for row in range(BOARD_HEIGHT):
-            for col in range(BOARD_WIDTH):
-                x = HUMAN_BOARD_X + col * BLOCK_SIZE
-                y = BOARD_Y + row * BLOCK_SIZE
-                
-                # Draw grid cell
-                self.canvas.create_rectangle(
-                    x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                    outline=GRID_COLOR, width=1, tags="human_board"
-                )
-                
-                # Draw blocks on the board
-                if self.human_board[row][col]:
-                    self.canvas.create_rectangle(
-                        x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                        fill=self._get_color(self.human_current_shape),
-                        outline="", tags="human_board"
-                    )
-        
-        # Draw the current piece
-        if self.human_current_piece:
-            for row in range(len(self.human_current_piece)):
-                for col in range(len(self.human_current_piece[row])):
-                    if self.human_current_piece[row][col]:
-                        x = HUMAN_BOARD_X + (self.human_current_x + col) * BLOCK_SIZE
-                        y = BOARD_Y + (self.human_current_y + row) * BLOCK_SIZE
-                        
-                        self.canvas.create_rectangle(
-                            x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                            fill=self._get_color(self.human_current_shape),
-                            outline="white", tags="human_board"
-                        )
+        self._redraw_player_board(self.engine.human, self.human_renderer)
     
     def _redraw_ai_board(self):
         """Redraw the AI player's board"""
-        # Clear the existing board
-        self.canvas.delete("ai_board")
-        
-        # Draw the grid
-        for row in range(BOARD_HEIGHT):
-            for col in range(BOARD_WIDTH):
-                x = AI_BOARD_X + col * BLOCK_SIZE
-                y = BOARD_Y + row * BLOCK_SIZE
-                
-                # Draw grid cell
-                self.canvas.create_rectangle(
-                    x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                    outline=GRID_COLOR, width=1, tags="ai_board"
-                )
-                
-                # Draw blocks on the board
-                if self.ai_board[row][col]:
-                    self.canvas.create_rectangle(
-                        x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                        fill=self._get_color(self.ai_current_shape),
-                        outline="", tags="ai_board"
-                    )
-        
-        # Draw the current piece
-        if self.ai_current_piece:
-            for row in range(len(self.ai_current_piece)):
-                for col in range(len(self.ai_current_piece[row])):
-                    if self.ai_current_piece[row][col]:
-                        x = AI_BOARD_X + (self.ai_current_x + col) * BLOCK_SIZE
-                        y = BOARD_Y + (self.ai_current_y + row) * BLOCK_SIZE
-                        
-                        self.canvas.create_rectangle(
-                            x, y, x + BLOCK_SIZE, y + BLOCK_SIZE,
-                            fill=self._get_color(self.ai_current_shape),
-                            outline="white", tags="ai_board"
-                        )
+        self._redraw_player_board(self.engine.ai, self.ai_renderer)
+    
+    def _redraw_player_board(self, player, renderer):
+        """Update a player's board items, skipping boards unchanged since the last frame"""
+        color = self._get_color(player.shape)
+        state = (player.revision, color)
+        if renderer.drawn_state == state:
+            metrics.count('render.skipped')
+            return
+        renderer.drawn_state = state
+        with metrics.timer('render.redraw'):
+            renderer.render(player.board, player.piece, player.x, player.y, color)
     
     def _get_color(self, shape_key):
         """Get the color for a tetromino shape"""
-        if self.using_alt_colors:
+        if self.engine.using_alt_colors:
             return ALT_PIECE_COLORS.get(shape_key, "#FFFFFF")
         else:
             return PIECE_COLORS.get(shape_key, "#FFFFFF")
     
     def _move_left(self, event):
         """Move the human player's piece left"""
-        if not self.paused and self.is_running and not self.game_over:
-            if not self._check_collision(self.human_board, self.human_current_piece, 
-                                        self.human_current_x - 1, self.human_current_y):
-                self.human_current_x -= 1
-                self._redraw_human_board()
+        if self._can_play():
+            self.engine.input(self.engine.human, LEFT)
     
     def _move_right(self, event):
         """Move the human player's piece right"""
-        if not self.paused and self.is_running and not self.game_over:
-            if not self._check_collision(self.human_board, self.human_current_piece, 
-                                        self.human_current_x + 1, self.human_current_y):
-                self.human_current_x += 1
-                self._redraw_human_board()
+        if self._can_play():
+            self.engine.input(self.engine.human, RIGHT)
     
     def _move_down(self, event):
         """Move the human player's piece down (soft drop)"""
-        if not self.paused and self.is_running and not self.game_over:
-            if not self._check_collision(self.human_board, self.human_current_piece, 
-                                        self.human_current_x, self.human_current_y + 1):
-                self.human_current_y += 1
-                self._redraw_human_board()
+        if self._can_play():
+            self.engine.input(self.engine.human, DOWN)
     
     def _rotate(self, event):
         """Rotate the human player's piece"""
-        if not self.paused and self.is_running and not self.game_over:
-            new_piece = self._rotate_piece(self.human_current_piece)
-            if not self._check_collision(self.human_board, new_piece, 
-                                        self.human_current_x, self.human_current_y):
-                self.human_current_piece = new_piece
-                self._redraw_human_board()
+        if self._can_play():
+            self.engine.input(self.engine.human, ROTATE)
     
     def _hard_drop(self, event):
         """Instantly drop the human player's piece to the bottom"""
-        if not self.paused and self.is_running and not self.game_over:
-            while not self._check_collision(self.human_board, self.human_current_piece, 
-                                           self.human_current_x, self.human_current_y + 1):
-                self.human_current_y += 1
-            
-            self._redraw_human_board()
+        if self._can_play():
+            self.engine.input(self.engine.human, DROP)
     
     def _toggle_pause(self, event):
         """Pause or unpause the game"""
+        if not self.is_running:
+            return
         self.paused = not self.paused
         
         if self.paused:
+            self.scheduler.pause()
             self._show_status_message("Game Paused - Press 'P' to Resume")
         else:
             self._clear_status_message()
-            # Restart the game loops if unpausing
-            self._human_game_loop()
-            self._ai_game_loop()
+            self.scheduler.resume()
+    
+    def _toggle_fast_forward(self, event):
+        """Run the game logic as fast as possible without drawing, or return to real time"""
+        if self.is_running:
+            self.scheduler.set_fast_forward(not self.scheduler.fast_forward)
+    
+    def _toggle_debug_overlay(self, event):
+        """Show or hide the metrics overlay, collecting metrics from now on"""
+        self.show_debug = not self.show_debug
+        if self.show_debug:
+            metrics.enabled = True
+            self._update_debug_overlay()
+            if self.is_running:
+                self._schedule_metrics_dump()
+        self.canvas.itemconfig(self.debug_text, state="normal" if self.show_debug else "hidden")
+    
+    def _update_debug_overlay(self):
+        """Show the latest metrics in the debug overlay"""
+        self.canvas.itemconfig(self.debug_text, text="\n".join(metrics.overlay_lines()))
+    
+    def _schedule_metrics_dump(self):
+        """Dump the metrics to INSTRUMENTATION_DUMP_FILE every INSTRUMENTATION_DUMP_INTERVAL"""
+        if metrics.enabled and self.dump_timer is None:
+            self.dump_timer = self.scheduler.schedule(
+                INSTRUMENTATION_DUMP_INTERVAL, self._dump_metrics
+            )
+    
+    def _dump_metrics(self):
+        """Write the metrics to disk and schedule the next dump"""
+        self.dump_timer = None
+        metrics.dump(INSTRUMENTATION_DUMP_FILE)
+        self._schedule_metrics_dump()
     
     def _game_over(self):
         """End the game"""
-        self.game_over = True
         self.is_running = False
+        self.scheduler.stop()
+        self.scheduler.fast_forward = False
         
-        # Display game over message and winner
-        human_score = self.score_manager.get_human_score()
-        ai_score = self.score_manager.get_ai_score()
+        # Frames are only drawn when due, so show the lock or spawn that ended the game
+        self._render_frame()
+        if metrics.enabled:
+            metrics.dump(INSTRUMENTATION_DUMP_FILE)
+        if self.telemetry:
+            self.telemetry.writer.flush()
         
-        if human_score > ai_score:
-            winner = "Human Wins!"
-        elif ai_score > human_score:
-            winner = "AI Wins!"
+        # Display game over message and winner
+        winner = self.engine.winner()
+        if winner is None:
+            message = "It's a Tie!"
         else:
-            winner = "It's a Tie!"
+            message = f"{winner.name} Wins!"
         
-        self._show_status_message(f"Game Over! {winner} Press 'R' to Restart")
+        self._show_status_message(f"Game Over! {message} Press 'R' to Restart")
         
         # Add restart binding
         self.master.bind("r", self._restart_game)
     
+    def _on_destroy(self, event=None):
+        """
+        Stop the game when its window is destroyed: write the remaining telemetry
+        records, finish the replay file and stop the AI worker
+        """
+        self.is_running = False
+        self.scheduler.stop()
+        self.ai_worker.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.telemetry:
+            self.telemetry.writer.close()
+    
     def _restart_game(self, event=None):
         """Restart the game"""
-        # Reset boards
-        self.human_board = self._create_empty_board()
-        self.ai_board = self._create_empty_board()
+        if self.is_running:
+            return
         
-        # Cancel any pending timers
-        if self.color_change_timer:
-            self.master.after_cancel(self.color_change_timer)
-        if self.flash_timer:  # Add this line
-            self.master.after_cancel(self.flash_timer)
-        if self.slowdown_timer:
-            self.master.after_cancel(self.slowdown_timer)
\ No newline at end of file
+        # Pending timers are discarded when the engine restarts
+        self.flash_timer = None
+        self._clear_status_message()
+        self.start()
@@ -0,0 +1,207 @@
+"""
+Weight tuning pipeline for the Tetris AI evaluation.
+Searches the weight space with the cross-entropy method, scoring every candidate
+with parallel headless self-play games, or with the vectorized batch simulator,
+and checkpoints after each generation.
+
+Usage: python -m tuning --generations 50 --population 32 --games 16 [--batch]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from ai import save_weights
+from batch_sim import BatchSimulator
+from constants import AI_WEIGHTS, AI_WEIGHTS_FILE
+from selfplay import run_game
+
+# Extra standard deviation added to each generation, decaying over time,
+# so the search does not collapse before it has found a good region
+NOISE = 1.0
+
+
+class CrossEntropyTuner:
+    def __init__(self, population=32, elite_fraction=0.25, games=16, max_pieces=500,
+                 depth=1, seed=0, workers=None, checkpoint_path="tuning_checkpoint.json",
+                 output_path=AI_WEIGHTS_FILE, batch=False):
+        """
+        Initialize the tuner with a search distribution centred on AI_WEIGHTS
+        With batch set, every game of a generation is played at once by the batch
+        simulator, which only plays depth 1 hard drops
+        """
+        self.population = population
+        self.elite_count = max(1, int(population * elite_fraction))
+        self.games = games
+        self.max_pieces = max_pieces
+        self.depth = depth
+        self.seed = seed
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self.output_path = output_path
+        self.batch = batch
+
+        self.generation = 0
+        self.mean = dict(AI_WEIGHTS)
+        self.std = {name: max(abs(value), 1.0) for name, value in AI_WEIGHTS.items()}
+        self.best_weights = dict(AI_WEIGHTS)
+        self.best_fitness = float('-inf')
+        self.history = []
+
+    def sample(self):
+        """Draw this generation's candidate weights from the search distribution"""
+        # Seeding by generation makes a resumed run draw the same candidates
+        rng = random.Random(self.seed * 1000003 + self.generation)
+        return [
+            {name: rng.gauss(self.mean[name], self.std[name]) for name in self.mean}
+            for _ in range(self.population)
+        ]
+
+    def evaluate(self, executor, candidates):
+        """
+        Score every candidate by the mean score of its self-play games
+        All candidates of a generation play the same seeds, so they are compared fairly
+        The executor is None when the batch simulator plays the games
+        """
+        first_seed = self.seed + self.generation * self.games
+        if self.batch:
+            simulator = BatchSimulator(max_pieces=self.max_pieces, seed=first_seed)
+            results = simulator.run(
+                (first_seed + game, weights) for weights in candidates for game in range(self.games)
+            )
+            return [
+                statistics.mean(
+                    result['ai_score'] for result in results[index * self.games:(index + 1) * self.games]
+                )
+                for index in range(len(candidates))
+            ]
+
+        futures = [
+            [
+                executor.submit(
+                    run_game, game, first_seed + game, 'solo', self.max_pieces,
+                    {'weights': weights, 'depth': self.depth}
+                )
+                for game in range(self.games)
+            ]
+            for weights in candidates
+        ]
+        return [
+            statistics.mean(future.result()['ai_score'] for future in games)
+            for games in futures
+        ]
+
+    def update(self, candidates, fitness):
+        """Refit the search distribution to the elite candidates"""
+        ranked = sorted(zip(fitness, range(len(candidates))), reverse=True)
+        elite = [candidates[index] for _, index in ranked[:self.elite_count]]
+
+        noise = NOISE / (self.generation + 1)
+        for name in self.mean:
+            values = [weights[name] for weights in elite]
+            self.mean[name] = statistics.mean(values)
+            spread = statistics.pstdev(values)
+            self.std[name] = spread + noise
+
+        best_fitness, best_index = ranked[0]
+        if best_fitness > self.best_fitness:
+            self.best_fitness = best_fitness
+            self.best_weights = dict(candidates[best_index])
+            save_weights(self.output_path, self.best_weights,
+                         fitness=self.best_fitness, generation=self.generation)
+
+        self.history.append({
+            'generation': self.generation,
+            'best_fitness': best_fitness,
+            'mean_fitness': statistics.mean(fitness),
+            'mean': dict(self.mean)
+        })
+        self.generation += 1
+
+    def run(self, generations):
+        """
+        Run the tuner until it has completed the given number of generations
+        Games are played in a process pool, unless the batch simulator plays them
+        """
+        pool = nullcontext() if self.batch else ProcessPoolExecutor(max_workers=self.workers)
+        with pool as executor:
+            while self.generation < generations:
+                candidates = self.sample()
+                fitness = self.evaluate(executor, candidates)
+                self.update(candidates, fitness)
+                self.save_checkpoint()
+                print(json.dumps(self.history[-1]), flush=True)
+        return self.best_weights
+
+    def state(self):
+        """Return the resumable state of the tuner"""
+        return {
+            'generation': self.generation,
+            'mean': self.mean,
+            'std': self.std,
+            'best_weights': self.best_weights,
+            'best_fitness': self.best_fitness,
+            'history': self.history
+        }
+
+    def save_checkpoint(self):
+        """Write the tuner state atomically, so an interrupted write never corrupts it"""
+        temporary_path = self.checkpoint_path + ".tmp"
+        with open(temporary_path, 'w') as checkpoint:
+            json.dump(self.state(), checkpoint, indent=2)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """Resume from the checkpoint file; returns False if there is none"""
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path) as checkpoint:
+            state = json.load(checkpoint)
+        self.generation = state['generation']
+        self.mean = state['mean']
+        self.std = state['std']
+        self.best_weights = state['best_weights']
+        self.best_fitness = state['best_fitness']
+        self.history = state['history']
+        return True
+
+
+def parse_args(argv=None):
+    """Parse the command line options of the tuner"""
+    parser = argparse.ArgumentParser(description="Tune the AI evaluation weights with self-play")
+    parser.add_argument("--generations", type=int, default=50, help="generations to run in total")
+    parser.add_argument("--population", type=int, default=32, help="candidates per generation")
+    parser.add_argument("--elite", type=float, default=0.25, help="fraction of candidates kept")
+    parser.add_argument("--games", type=int, default=16, help="games played per candidate")
+    parser.add_argument("--max-pieces", type=int, default=500, help="piece limit of each game")
+    parser.add_argument("--depth", type=int, default=1, help="AI search depth during tuning")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the search and the games")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--checkpoint", default="tuning_checkpoint.json", help="checkpoint file")
+    parser.add_argument("--output", default=AI_WEIGHTS_FILE, help="weight profile to write")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    parser.add_argument("--batch", action="store_true",
+                        help="play the games with the vectorized batch simulator (depth 1)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the tuner from the command line"""
+    args = parse_args(argv)
+    tuner = CrossEntropyTuner(
+        population=args.population, elite_fraction=args.elite, games=args.games,
+        max_pieces=args.max_pieces, depth=args.depth, seed=args.seed,
+        workers=args.workers, checkpoint_path=args.checkpoint, output_path=args.output,
+        batch=args.batch
+    )
+    if args.resume:
+        tuner.load_checkpoint()
+    tuner.run(args.generations)
+
+
+if __name__ == "__main__":
+    main()